@@ -3,16 +3,19 @@ from flask_cors import CORS
 from app.config import config
 from app.database.connection import Database
 from app.api.routes import api_bp, init_routes
+from app.utils.json_provider import OrjsonProvider
 
 
 def create_app(config_name='default'):
     app = Flask(__name__)
     # Load configuration
     app.config.from_object(config[config_name])
+    # Serialize JSON responses with orjson
+    app.json = OrjsonProvider(app)
     # Enable CORS
     CORS(app)
     # Initialize database
-    db = Database(app.config['DATABASE_URL'])
+    db = Database(app.config['DATABASE_URL'], **app.config['DB_ENGINE_OPTIONS'])
     # Initialize routes with database
     init_routes(db)
     # Register blueprints
@@ -2,17 +2,27 @@
 from flask import Blueprint, jsonify, request
 from app.database.connection import Database
 from app.services.article_service import ArticleService
+from app.services.job_service import JobService
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 # Global variables for database and service (will be initialized)
 article_service_instance = None
+job_service_instance = None
 
 
 def init_routes(db: Database):
     # Initialize routes with database instance
-    global article_service_instance
+    global article_service_instance, job_service_instance
     article_service_instance = ArticleService(db)
+    job_service_instance = JobService(db)
+
+
+@api_bp.teardown_request
+def remove_session(exc):
+    # Return the request-scoped session to the pool once the response is done
+    if article_service_instance is not None:
+        article_service_instance.db.remove_session()
 
 
 @api_bp.route('/health', methods=['GET'])
@@ -21,61 +31,70 @@ def health_check():
     return jsonify({'status': 'healthy', 'message': 'HackerNews API is running'})
 
 
-@api_bp.route('/articles/fetch/top', methods=['POST'])
-def fetch_top():
-    # Fetch and store top articles
-    limit = request.json.get('limit', 10) if request.json else 10
-    
+def _run_fetch_job(fetch_func, limit: int, label: str) -> dict:
+    # Run a fetch-and-save call on a job worker thread. Returns: Result payload stored on the job
     try:
-        saved_count, updated_count, failed_urls = article_service_instance.fetch_and_save_top_articles(limit)
-        return jsonify({
-            'success': True,
+        saved_count, updated_count, failed_urls = fetch_func(limit)
+        return {
             'saved': saved_count,
             'updated': updated_count,
             'failed_urls': failed_urls,
             'failed_count': len(failed_urls),
-            'message': f'Successfully fetched articles (saved: {saved_count}, updated: {updated_count}, failed: {len(failed_urls)})'
-        }), 200
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+            'message': f'Successfully fetched {label} (saved: {saved_count}, updated: {updated_count}, failed: {len(failed_urls)})'
+        }
+    finally:
+        # Job threads are reused, so release this thread's session like teardown_request does
+        article_service_instance.db.remove_session()
 
 
-@api_bp.route('/articles/fetch/trending', methods=['POST'])
-def fetch_trending():
-    # Fetch and store trending articles
+def _enqueue_fetch(fetch_func, label: str):
+    # Queue a fetch job and answer 202 with the id to poll at /api/jobs/<job_id>
     limit = request.json.get('limit', 10) if request.json else 10
     
     try:
-        saved_count, updated_count, failed_urls = article_service_instance.fetch_and_save_trending_articles(limit)
+        job_id = job_service_instance.submit_job(_run_fetch_job, fetch_func, limit, label)
         return jsonify({
             'success': True,
-            'saved': saved_count,
-            'updated': updated_count,
-            'failed_urls': failed_urls,
-            'failed_count': len(failed_urls),
-            'message': f'Successfully fetched trending articles (saved: {saved_count}, updated: {updated_count}, failed: {len(failed_urls)})'
-        }), 200
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}',
+            'message': f'Fetching {label} in the background'
+        }), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@api_bp.route('/articles/fetch/top', methods=['POST'])
+def fetch_top():
+    # Fetch and store top articles (runs as a background job)
+    return _enqueue_fetch(article_service_instance.fetch_and_save_top_articles, 'articles')
+
+
+@api_bp.route('/articles/fetch/trending', methods=['POST'])
+def fetch_trending():
+    # Fetch and store trending articles (runs as a background job)
+    return _enqueue_fetch(article_service_instance.fetch_and_save_trending_articles, 'trending articles')
+
+
 @api_bp.route('/articles/fetch/new', methods=['POST'])
 def fetch_new():
-    # Fetch and store new articles
-    limit = request.json.get('limit', 10) if request.json else 10
-    
-    try:
-        saved_count, updated_count, failed_urls = article_service_instance.fetch_and_save_new_articles(limit)
-        return jsonify({
-            'success': True,
-            'saved': saved_count,
-            'updated': updated_count,
-            'failed_urls': failed_urls,
-            'failed_count': len(failed_urls),
-            'message': f'Successfully fetched new articles (saved: {saved_count}, updated: {updated_count}, failed: {len(failed_urls)})'
-        }), 200
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    # Fetch and store new articles (runs as a background job)
+    return _enqueue_fetch(article_service_instance.fetch_and_save_new_articles, 'new articles')
+
+
+@api_bp.route('/articles/fetch/all', methods=['POST'])
+def fetch_all():
+    # Fetch and store top, trending and new articles in one job
+    return _enqueue_fetch(article_service_instance.fetch_and_save_all_articles, 'top, trending and new articles')
+
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    # Get the status (queued, running, finished, failed) and result of a fetch job
+    job = job_service_instance.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job}), 200
 
 
 @api_bp.route('/articles', methods=['GET'])
@@ -94,6 +113,7 @@ def get_articles():
         end_date = request.args.get('end_date', '').strip() or None
         sort_by = request.args.get('sort_by', 'score')
         order = request.args.get('order', 'desc')
+        cursor = request.args.get('cursor', '').strip() or None
         
         # Get articles from service
         result = article_service_instance.get_articles(
@@ -107,7 +127,8 @@ def get_articles():
             start_date=start_date,
             end_date=end_date,
             sort_by=sort_by,
-            order=order
+            order=order,
+            cursor=cursor
         )
         
         return jsonify({
@@ -115,6 +136,8 @@ def get_articles():
             **result
         }), 200
     
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -147,7 +170,7 @@ def get_trending():
         
         return jsonify({
             'success': True,
-            'data': [article.to_dict() for article in articles],
+            'data': articles,
             'count': len(articles)
         }), 200
     
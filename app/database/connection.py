@@ -1,20 +1,91 @@
 
-from sqlalchemy import create_engine
+import os
+import weakref
+from contextlib import contextmanager
+from functools import lru_cache
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+from app.config import Config
 
 Base = declarative_base()
 
+# Extensions required by models and their indexes (vector for embeddings and HNSW, pg_trgm for trigram GIN)
+REQUIRED_EXTENSIONS = ('vector', 'pg_trgm')
+
 
 class Database:    
-    def __init__(self, database_url: str):
-        self.engine = create_engine(database_url)
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+    def __init__(self, database_url: str, **engine_options):
+        # engine_options are passed to create_engine (pool_size, max_overflow, pool_pre_ping, ...)
+        self.engine = create_engine(database_url, **engine_options)
+        # expire_on_commit=False so objects stay readable after commit without a re-SELECT
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, expire_on_commit=False)
+        # Thread-local session registry - one session per request/thread
+        self.Session = scoped_session(self.SessionLocal)
+        _databases.add(self)
+        self._create_extensions()
         Base.metadata.create_all(bind=self.engine)
     
     def get_session(self):
-        return self.SessionLocal()
+        # Session for the current thread. Call remove_session() when the unit of work ends
+        return self.Session()
+    
+    @contextmanager
+    def session_scope(self):
+        # Standalone session for one unit of work: commit on success, roll back on error, always close
+        session = self.SessionLocal()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    def remove_session(self):
+        # Close the current thread's session and return its connection to the pool
+        self.Session.remove()
+    
+    def dispose_pool(self):
+        # Drop pooled connections inherited from a parent process without closing them,
+        # so a forked worker opens its own instead of sharing the parent's sockets
+        self.engine.dispose(close=False)
+    
+    def _create_extensions(self):
+        # Extensions must exist before create_all builds indexes that use their operator classes
+        with self.engine.begin() as conn:
+            for extension in REQUIRED_EXTENSIONS:
+                conn.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
     
     def create_tables(self):
+        self._create_extensions()
         Base.metadata.create_all(bind=self.engine)
+        self._create_missing_indexes()
+    
+    def _create_missing_indexes(self):
+        # create_all skips tables that already exist, so also create any newly declared indexes
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+
+
+@lru_cache(maxsize=1)
+def get_db() -> Database:
+    # Process-wide Database for code running outside the Flask app (e.g. RAG search from the Streamlit UI).
+    # Built once, so the engine, its connection pool and the schema check are not repeated per call
+    return Database(Config.DATABASE_URL, **Config.DB_ENGINE_OPTIONS)
+
+
+_databases: 'weakref.WeakSet[Database]' = weakref.WeakSet()
+
+
+def _dispose_pools_after_fork() -> None:
+    for db in list(_databases):
+        db.dispose_pool()
+
 
+# Registered once for every Database (create_app's and get_db()'s). With a preloading server (gunicorn --preload)
+# they are built before workers fork; each worker resets the inherited pools and connects on its own
+os.register_at_fork(after_in_child=_dispose_pools_after_fork)
@@ -21,6 +21,15 @@ class Article(Base):
     __table_args__ = (
         Index('idx_score_created', 'score', 'created_at'),
         Index('idx_title_search', 'title'),
+        # Keyset pagination indexes, declared in get_articles' sort order (NULL sorts as the smallest value):
+        # DESC NULLS LAST reads them forward, ASC NULLS FIRST backward, so one index serves both directions
+        Index('idx_score_desc_id', score.desc().nulls_last(), id.desc()),
+        Index('idx_created_desc_id', created_at.desc().nulls_last(), id.desc()),
+        Index('idx_comments_desc_id', comment_count.desc().nulls_last(), id.desc()),
+        # Trigram GIN indexes (pg_trgm) so ILIKE '%keyword%' filters avoid a seq scan
+        Index('idx_articles_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('idx_articles_author_trgm', 'author', postgresql_using='gin', postgresql_ops={'author': 'gin_trgm_ops'}),
+        Index('idx_articles_tags_trgm', 'tags', postgresql_using='gin', postgresql_ops={'tags': 'gin_trgm_ops'}),
     )
     
     def to_dict(self):
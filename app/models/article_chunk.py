@@ -1,8 +1,38 @@
-from sqlalchemy import Column, Integer, BigInteger, Text, DateTime, CheckConstraint, Index
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, Integer, BigInteger, Text, DateTime, CheckConstraint, Index, cast, func, text
+from pgvector.sqlalchemy import BIT, HALFVEC
+from pgvector.utils import HalfVector
 from datetime import datetime
+import numpy as np
 from app.database.connection import Base
 
+EMBEDDING_DIMENSIONS = 1536
+
+
+class CompactHALFVEC(HALFVEC):
+    # HALFVEC with a vectorized bind path: values are rounded to fp16 in numpy and sent with 5 significant
+    # digits, which identifies every fp16 value exactly (psycopg2 only sends parameters as text) in about
+    # half the characters and formatting time of pgvector's per-element str(float(v))
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            if value is None:
+                return None
+            if isinstance(value, HalfVector):
+                value = value.to_numpy()
+            value = np.asarray(value, dtype=np.float16)
+            if value.ndim != 1:
+                raise ValueError('expected ndim to be 1')
+            if self.dim is not None and value.shape[0] != self.dim:
+                raise ValueError('expected %d dimensions, not %d' % (self.dim, value.shape[0]))
+            return '[' + ','.join(['%.5g' % v for v in value.tolist()]) + ']'
+        return process
+
+
+def binary_quantize(embedding):
+    # Sign-bit quantization of an embedding expression: 1536 dims -> bit(1536), 192 bytes
+    return cast(func.binary_quantize(embedding), BIT(EMBEDDING_DIMENSIONS))
+
 
 class ArticleChunk(Base):
     __tablename__ = 'article_chunks'
@@ -12,7 +42,7 @@ class ArticleChunk(Base):
     chunk_text = Column(Text, nullable=False)
     chunk_type = Column(Text, nullable=False)  # 'header' or 'content'
     chunk_index = Column(Integer, nullable=False)
-    embedding = Column(Vector(1536), nullable=True)  # 1536 dimensions - OpenAI compatible
+    embedding = Column(CompactHALFVEC(EMBEDDING_DIMENSIONS), nullable=True)  # 1536 dimensions, stored as fp16 (half the size of vector)
     token_count = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -33,3 +63,15 @@ class ArticleChunk(Base):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+# Approximate nearest-neighbour index for the coarse pass of header search: Hamming distance over
+# binary-quantized embeddings (expression index, no extra column). Partial, so the graph holds only
+# header chunks and the chunk_type filter never discards ANN candidates
+Index(
+    'idx_chunks_header_embedding_bq_hnsw',
+    binary_quantize(ArticleChunk.embedding).label('embedding_bq'),
+    postgresql_using='hnsw',
+    postgresql_with={'m': 16, 'ef_construction': 64},
+    postgresql_ops={'embedding_bq': 'bit_hamming_ops'},
+    postgresql_where=text("chunk_type = 'header'")
+)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Text, DateTime, JSON, Index
+from datetime import datetime
+from app.database.connection import Base
+
+
+class Job(Base):
+    # Background fetch job status, stored in the database so every worker process can answer a poll
+    __tablename__ = 'jobs'
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    status = Column(String(16), nullable=False)  # 'queued', 'running', 'finished' or 'failed'
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Pruning keeps the newest finished jobs; the stale sweep finds old unfinished ones
+        Index('idx_jobs_status_created', 'status', 'created_at'),
+    )
+
+    def to_dict(self):
+        # Convert job to dictionary
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -1,7 +1,10 @@
 # Article Service - Business Logic Layer
-from typing import Dict, List, Optional, Tuple
-from sqlalchemy import func
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import and_, bindparam, func, literal_column, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime
+import base64
+import json
 import logging
 from app.models.article import Article
 from app.models.article_chunk import ArticleChunk
@@ -11,16 +14,64 @@ from app.services.hn_fetcher import (
     fetch_new_articles, fetch_best_articles
 )
 from app.services.scraping_service import scrape_article_content
-from app.services.summary_service import generate_summary_and_tags
+from app.services.summary_service import generate_summaries_and_tags
 from app.services.chunking_services import chunk_article
 from app.services.embedding_service import generate_embeddings
+from app.utils.cache import TTLCache
+from app.utils.concurrency import parallel_map
 
 logger = logging.getLogger(__name__)
 
+# Built once: the statement text is identical for every lookup, so its compiled
+# form is reused from SQLAlchemy's compiled cache and only the id is bound per call
+_ARTICLE_BY_ID = select(Article).where(Article.id == bindparam('article_id'))
+
+
+def _build_text_filter(column, term: str):
+    # Case-insensitive substring match with %, _ and backslash in the term escaped,
+    # so user input can't widen the pattern. Served by the column's trigram GIN index
+    term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return column.ilike(f'%{term}%', escape='\\')
+
+
+def _encode_cursor(sort_value: Any, article_id: int) -> str:
+    # Encode the (sort value, id) of the last row on a page as an opaque cursor
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, article_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_cursor(cursor: str, sort_by: str) -> Tuple[Any, int]:
+    # Decode a cursor produced by _encode_cursor. Raises ValueError if it is malformed
+    try:
+        sort_value, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_by == 'created_at' and sort_value is not None:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(article_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 
 class ArticleService:    
+    # Upper bound on concurrent scrape and chunk + embed jobs per batch
+    MAX_SCRAPE_WORKERS = 16
+    # Rows fetched per round-trip when streaming list results
+    YIELD_PER = 200
+    # Largest page get_articles serves; bigger per_page values are capped to it
+    MAX_PER_PAGE = 200
+    # Seconds a computed get_stats() result is served from memory
+    STATS_TTL = 30
+    # Columns served by list endpoints - content/summary are only returned by the detail endpoint
+    LIST_COLUMNS = (
+        Article.id, Article.hn_id, Article.title, Article.url, Article.author,
+        Article.score, Article.comment_count, Article.created_at, Article.tags
+    )
+    
     def __init__(self, db: Database):
         self.db = db
+        # Stats only change when articles are saved, which clears this cache
+        self._stats_cache = TTLCache(ttl=self.STATS_TTL, maxsize=1)
     
     def _parse_date(self, date_str: str, end_of_day: bool = False) -> Optional[datetime]:
         """
@@ -70,115 +121,166 @@ class ArticleService:
         failed_urls = []
         
         try:
-            # Batch query all existing articles to avoid N+1 problem
+            # Batch query which articles already exist (and whether they have content)
+            # so we know what to scrape - only two scalar columns, no ORM objects
             hn_ids = [article_data['hn_id'] for article_data in articles]
-            existing_articles = {
-                article.hn_id: article 
-                for article in session.query(Article).filter(Article.hn_id.in_(hn_ids)).all()
+            has_content_by_hn_id = {
+                hn_id: has_content
+                for hn_id, has_content in session.query(
+                    Article.hn_id,
+                    func.coalesce(func.length(Article.content), 0) > 0
+                ).filter(Article.hn_id.in_(hn_ids)).all()
             }
             
-            for article_data in articles:
-                existing = existing_articles.get(article_data['hn_id'])
-                
-                # Scrape content if URL is available and content doesn't exist
-                scraped_content = None
-                generated_summary = None
-                generated_tags = None
+            # Scrape, summarize, chunk and embed off the DB thread - these are network/LLM bound.
+            # DB writes stay on this thread so the session is never shared.
+            prepared = self._prepare_articles(articles, has_content_by_hn_id)
+            
+            # Build one row per article to upsert (keyed by hn_id - ON CONFLICT
+            # cannot touch the same row twice in a single statement)
+            rows = {}
+            chunks_by_hn_id = {}
+            for article_data, (scraped_content, generated_summary, generated_tags, chunks) in zip(articles, prepared):
                 url = article_data.get('url')
-                title = article_data.get('title', '')
                 
-                if url and url.strip():
-                    # Only scrape if content doesn't exist or is empty
-                    if not existing or not existing.content:
-                        scraped_content = scrape_article_content(url)
-                        # Generate summary and tags ONLY for NEW articles (not existing ones)
-                        # Never generate or update summary/tags for existing articles
-                        if scraped_content and not existing:
-                            generated_summary, generated_tags = generate_summary_and_tags(title, scraped_content)
+                # Only create new article if content was successfully scraped
+                if article_data['hn_id'] not in has_content_by_hn_id and scraped_content is None:
+                    # Track failed URLs for new articles that weren't saved (only if URL exists)
+                    if url and url.strip():
+                        failed_urls.append(url)
+                    continue
+                
+                rows[article_data['hn_id']] = {
+                    'hn_id': article_data['hn_id'],
+                    'title': article_data['title'],
+                    'url': article_data['url'],
+                    'author': article_data['author'],
+                    'score': article_data['score'],
+                    'comment_count': article_data['comment_count'],
+                    'created_at': article_data.get('created_at'),
+                    'tags': generated_tags,
+                    'content': scraped_content,
+                    'summary': generated_summary
+                }
+                chunks_by_hn_id[article_data['hn_id']] = chunks
+            
+            if rows:
+                # Single INSERT ... ON CONFLICT for the whole batch. Existing articles
+                # NEVER get summary or tags updated, and keep their content/created_at
+                # unless we have a fresh value. (xmax = 0) is true only for inserted rows.
+                stmt = pg_insert(Article.__table__).values(list(rows.values()))
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Article.hn_id],
+                    set_={
+                        'title': stmt.excluded.title,
+                        'url': stmt.excluded.url,
+                        'score': stmt.excluded.score,
+                        'comment_count': stmt.excluded.comment_count,
+                        'created_at': func.coalesce(stmt.excluded.created_at, Article.created_at),
+                        'content': func.coalesce(stmt.excluded.content, Article.content)
+                    }
+                ).returning(Article.hn_id, literal_column('xmax = 0').label('inserted'))
                 
-                if existing:
-                    # Update existing article - NEVER update summary or tags
-                    existing.title = article_data['title']
-                    existing.url = article_data['url']
-                    existing.score = article_data['score']
-                    existing.comment_count = article_data['comment_count']
-                    if article_data.get('created_at'):
-                        existing.created_at = article_data['created_at']
-                    # Update content only if we successfully scraped it
-                    if scraped_content:
-                        existing.content = scraped_content
-                    # DO NOT update summary or tags for existing articles
-                    updated_count += 1
-                else:
-                    # Only create new article if content was successfully scraped
-                    if scraped_content is not None:
-                        article = Article(
-                            hn_id=article_data['hn_id'],
-                            title=article_data['title'],
-                            url=article_data['url'],
-                            author=article_data['author'],
-                            score=article_data['score'],
-                            comment_count=article_data['comment_count'],
-                            created_at=article_data.get('created_at'),
-                            tags=generated_tags,
-                            content=scraped_content,
-                            summary=generated_summary
-                        )
-                        session.add(article)
-                        session.flush()  # Get the article ID before chunking
-                        
-                        # ========================================
-                        # CHUNK AND EMBED IMMEDIATELY
-                        # ========================================
-                        try:
-                            # Create chunks with full metadata
-                            chunks = chunk_article(
-                                title=article.title,
-                                summary=article.summary or "",
-                                content=article.content or "",
-                                author=article.author,
-                                score=article.score,
-                                comment_count=article.comment_count,
-                                tags=article.tags,
-                                created_at=article.created_at.isoformat() if article.created_at else None,
-                                url=article.url
-                            )
-                            
-                            if chunks:
-                                # Generate embeddings in batch
-                                chunk_texts = [c['chunk_text'] for c in chunks]
-                                embeddings = generate_embeddings(chunk_texts)
-                                
-                                # Save chunks to database
-                                for chunk_data, embedding in zip(chunks, embeddings):
-                                    chunk = ArticleChunk(
-                                        article_id=article.hn_id,
-                                        chunk_text=chunk_data['chunk_text'],
-                                        chunk_type=chunk_data['chunk_type'],
-                                        chunk_index=chunk_data['chunk_index'],
-                                        token_count=chunk_data['token_count'],
-                                        embedding=embedding
-                                    )
-                                    session.add(chunk)
-                                
-                                logger.info(f"Created {len(chunks)} chunks for article {article.hn_id}")
-                        except Exception as e:
-                            logger.warning(f"Failed to chunk article {article.hn_id}: {e}")
-                            # Don't fail the entire operation if chunking fails
-                        
+                for hn_id, inserted in session.execute(stmt).all():
+                    if inserted:
+                        # Embeddings were computed before the upsert, so the transaction only spans DB work
+                        session.add_all([
+                            ArticleChunk(article_id=hn_id, **chunk_data)
+                            for chunk_data in chunks_by_hn_id.get(hn_id, [])
+                        ])
                         saved_count += 1
                     else:
-                        # Track failed URLs for new articles that weren't saved (only if URL exists)
-                        if url and url.strip():
-                            failed_urls.append(url)
+                        updated_count += 1
             
             session.commit()
+            self._stats_cache.clear()
             return saved_count, updated_count, failed_urls
         except Exception as e:
             session.rollback()
             raise e
-        finally:
-            session.close()
+    
+    def _prepare_articles(
+        self, articles: List[Dict], has_content_by_hn_id: Dict[int, bool]
+    ) -> List[Tuple[Optional[str], Optional[str], Optional[str], List[Dict]]]:
+        # Scrape every article concurrently, summarize the new ones in packed LLM calls, then chunk and embed them.
+        # Returns: (scraped_content, summary, tags, chunks) per article, in articles order; only new articles get summary, tags and chunks
+        is_new = [article_data['hn_id'] not in has_content_by_hn_id for article_data in articles]
+        contents = parallel_map(
+            lambda args: self._scrape_if_needed(*args),
+            [
+                (article_data, new, has_content_by_hn_id.get(article_data['hn_id'], False))
+                for article_data, new in zip(articles, is_new)
+            ],
+            max_workers=self.MAX_SCRAPE_WORKERS
+        )
+        prepared = [(content, None, None, []) for content in contents]
+        
+        # Generate summary and tags ONLY for NEW articles (not existing ones) - several articles share each LLM call,
+        # paced by the summary service's Groq rate limiter
+        new_indexes = [idx for idx, content in enumerate(contents) if is_new[idx] and content]
+        if not new_indexes:
+            return prepared
+        summaries = generate_summaries_and_tags(
+            [(articles[idx].get('title', ''), contents[idx]) for idx in new_indexes]
+        )
+        
+        all_chunks = parallel_map(
+            lambda args: self._build_chunks(articles[args[0]], contents[args[0]], *args[1]),
+            list(zip(new_indexes, summaries)),
+            max_workers=self.MAX_SCRAPE_WORKERS
+        )
+        for idx, (summary, tags), chunks in zip(new_indexes, summaries, all_chunks):
+            prepared[idx] = (contents[idx], summary, tags, chunks)
+        return prepared
+    
+    def _build_chunks(
+        self, article_data: Dict, content: str, summary: Optional[str], tags: Optional[str]
+    ) -> List[Dict]:
+        # Chunk a new article and embed the chunks. Returns: ArticleChunk column values per chunk (empty if chunking fails)
+        try:
+            # Create chunks with full metadata
+            created_at = article_data.get('created_at')
+            chunks = chunk_article(
+                title=article_data['title'],
+                summary=summary or "",
+                content=content or "",
+                author=article_data['author'],
+                score=article_data['score'],
+                comment_count=article_data['comment_count'],
+                tags=tags,
+                created_at=created_at.isoformat() if created_at else None,
+                url=article_data['url']
+            )
+            
+            if not chunks:
+                return []
+            
+            # Generate embeddings in batch
+            embeddings = generate_embeddings([c['chunk_text'] for c in chunks])
+            
+            logger.info(f"Created {len(chunks)} chunks for article {article_data['hn_id']}")
+            return [
+                {
+                    'chunk_text': chunk_data['chunk_text'],
+                    'chunk_type': chunk_data['chunk_type'],
+                    'chunk_index': chunk_data['chunk_index'],
+                    'token_count': chunk_data['token_count'],
+                    'embedding': embedding
+                }
+                for chunk_data, embedding in zip(chunks, embeddings)
+            ]
+        except Exception as e:
+            logger.warning(f"Failed to chunk article {article_data['hn_id']}: {e}")
+            # Don't fail the entire operation if chunking fails
+            return []
+    
+    def _scrape_if_needed(self, article_data: Dict, is_new: bool, has_content: bool) -> Optional[str]:
+        # Scrape content if URL is available and content doesn't exist. Returns: Scraped content or None
+        url = article_data.get('url')
+        # Only scrape if content doesn't exist or is empty
+        if url and url.strip() and (is_new or not has_content):
+            return scrape_article_content(url)
+        return None
     
     def fetch_and_save_top_articles(self, limit: int = 10) -> Tuple[int, int, List[str]]:
         # Fetch top articles and save to database
@@ -195,6 +297,18 @@ class ArticleService:
         articles = fetch_new_articles(limit)
         return self.save_articles_to_db(articles)
     
+    def fetch_and_save_all_articles(self, limit: int = 10) -> Tuple[int, int, List[str]]:
+        # Fetch top, trending and new articles concurrently and save them in one batch
+        fetchers = [fetch_top_articles, fetch_trending_articles, fetch_new_articles]
+        results = parallel_map(lambda fetch: fetch(limit), fetchers, max_workers=len(fetchers))
+        
+        # Deduplicate by hn_id - the same story often appears in several lists
+        articles = {}
+        for article_data in (a for fetched in results for a in fetched):
+            articles.setdefault(article_data['hn_id'], article_data)
+        
+        return self.save_articles_to_db(list(articles.values()))
+    
     def get_articles(
         self,
         page: int = 1,
@@ -207,122 +321,159 @@ class ArticleService:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
         sort_by: str = 'score',
-        order: str = 'desc'
+        order: str = 'desc',
+        cursor: Optional[str] = None
     ) -> Dict:
+        # Pass cursor (next_cursor from a previous response) for keyset pagination - it skips COUNT(*) and OFFSET.
+        # Raises ValueError for a page or per_page below 1, or a malformed cursor
+        if page < 1:
+            raise ValueError(f"page must be at least 1, got {page}")
+        if per_page < 1:
+            raise ValueError(f"per_page must be at least 1, got {per_page}")
+        per_page = min(per_page, self.MAX_PER_PAGE)
+        
         session = self.db.get_session()
-        try:
-            # Build query
-            query = session.query(Article)
-            
-            # Filter by keyword (search in title)
-            if keyword:
-                query = query.filter(Article.title.ilike(f'%{keyword}%'))
-            
-            # Filter by author
-            if author:
-                query = query.filter(Article.author.ilike(f'%{author}%'))
-            
-            # Filter by score range
-            if min_score is not None:
-                query = query.filter(Article.score >= min_score)
-            if max_score is not None:
-                query = query.filter(Article.score <= max_score)
-            
-            # Filter by tags
-            if tag:
-                query = query.filter(Article.tags.ilike(f'%{tag}%'))
-            
-            # Filter by date range
-            if start_date:
-                try:
-                    # Parse various date formats
-                    start_dt = self._parse_date(start_date)
-                    if start_dt:
-                        query = query.filter(Article.created_at >= start_dt)
-                except ValueError:
-                    pass  # Ignore invalid date format
-            
-            if end_date:
-                try:
-                    # Parse various date formats and set to end of day if no time specified
-                    end_dt = self._parse_date(end_date, end_of_day=True)
-                    if end_dt:
-                        query = query.filter(Article.created_at <= end_dt)
-                except ValueError:
-                    pass  # Ignore invalid date format
-            
-            # Sorting
-            if sort_by == 'created_at':
-                order_by = Article.created_at
-            elif sort_by == 'comment_count':
-                order_by = Article.comment_count
-            else:
-                order_by = Article.score
-            
-            if order.lower() == 'asc':
-                query = query.order_by(order_by.asc())
+        # Build query on plain columns (no ORM object hydration)
+        query = session.query(*self.LIST_COLUMNS)
+        
+        # Filter by keyword (search in title)
+        if keyword and keyword.strip():
+            query = query.filter(_build_text_filter(Article.title, keyword))
+        
+        # Filter by author
+        if author and author.strip():
+            query = query.filter(_build_text_filter(Article.author, author))
+        
+        # Filter by score range
+        if min_score is not None:
+            query = query.filter(Article.score >= min_score)
+        if max_score is not None:
+            query = query.filter(Article.score <= max_score)
+        
+        # Filter by tags
+        if tag and tag.strip():
+            query = query.filter(_build_text_filter(Article.tags, tag))
+        
+        # Filter by date range
+        if start_date:
+            try:
+                # Parse various date formats
+                start_dt = self._parse_date(start_date)
+                if start_dt:
+                    query = query.filter(Article.created_at >= start_dt)
+            except ValueError:
+                pass  # Ignore invalid date format
+        
+        if end_date:
+            try:
+                # Parse various date formats and set to end of day if no time specified
+                end_dt = self._parse_date(end_date, end_of_day=True)
+                if end_dt:
+                    query = query.filter(Article.created_at <= end_dt)
+            except ValueError:
+                pass  # Ignore invalid date format
+        
+        # Sorting (id breaks ties so keyset pagination is stable). A NULL sort value (e.g. a story HN sent without
+        # a time) sorts as the smallest value: last when descending, first when ascending. Both orders match
+        # the (column DESC NULLS LAST, id DESC) keyset indexes, read forward or backward
+        if sort_by == 'created_at':
+            order_by = Article.created_at
+        elif sort_by == 'comment_count':
+            order_by = Article.comment_count
+        else:
+            sort_by = 'score'
+            order_by = Article.score
+        
+        ascending = order.lower() == 'asc'
+        if ascending:
+            query = query.order_by(order_by.asc().nulls_first(), Article.id.asc())
+        else:
+            query = query.order_by(order_by.desc().nulls_last(), Article.id.desc())
+        
+        # Pagination
+        if cursor:
+            # Keyset pagination: continue after the last (sort value, id) seen. The NULL run and the non-NULL
+            # rows are read with separate range predicates (no OR), so each query is a single index range scan
+            last_value, last_id = _decode_cursor(cursor, sort_by)
+            if last_value is None:
+                # Inside the NULL run: the rest of it, then (ascending) every non-NULL row
+                segments = [and_(order_by.is_(None), Article.id > last_id if ascending else Article.id < last_id)]
+                if ascending:
+                    segments.append(order_by.isnot(None))
             else:
-                query = query.order_by(order_by.desc())
-            
-            # Pagination
+                # Row comparison skips NULL sort values; descending, the NULL run follows the non-NULL rows
+                keyset = tuple_(order_by, Article.id)
+                segments = [keyset > tuple_(last_value, last_id) if ascending else keyset < tuple_(last_value, last_id)]
+                if not ascending:
+                    segments.append(order_by.is_(None))
+            rows = []
+            for predicate in segments:
+                rows += query.filter(predicate).limit(per_page - len(rows))\
+                    .execution_options(yield_per=self.YIELD_PER).all()
+                if len(rows) == per_page:
+                    break
+            pagination = {'per_page': per_page}
+        else:
             total = query.count()
-            articles = query.offset((page - 1) * per_page).limit(per_page).all()
-            
-            return {
-                'data': [article.to_dict() for article in articles],
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': total,
-                    'pages': (total + per_page - 1) // per_page if total > 0 else 0
-                }
+            rows = query.offset((page - 1) * per_page).limit(per_page)\
+                .execution_options(yield_per=self.YIELD_PER).all()
+            pagination = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page if total > 0 else 0
             }
-        finally:
-            session.close()
+        
+        # A full page may have more rows after it; a NULL sort value is encoded too (see the NULL run above)
+        last_row = rows[-1]._mapping if len(rows) == per_page else None
+        pagination['next_cursor'] = _encode_cursor(last_row[sort_by], last_row['id']) if last_row else None
+        
+        return {
+            'data': [dict(row._mapping) for row in rows],
+            'pagination': pagination
+        }
     
     def get_article_by_id(self, article_id: int) -> Optional[Article]:
         # Get a specific article by ID
         session = self.db.get_session()
-        
-        try:
-            article = session.query(Article).filter_by(id=article_id).first()
-            return article
-        finally:
-            session.close()
+        return session.execute(_ARTICLE_BY_ID, {'article_id': article_id}).scalar_one_or_none()
     
-    def get_trending_articles(self, limit: int = 10) -> List[Article]:
+    def get_trending_articles(self, limit: int = 10) -> List[Dict]:
         # Get top trending articles from database
         session = self.db.get_session()
         
-        try:
-            articles = session.query(Article)\
-                .order_by(Article.score.desc(), Article.created_at.desc())\
-                .limit(limit)\
-                .all()
-            return articles
-        finally:
-            session.close()
+        rows = session.query(*self.LIST_COLUMNS)\
+            .order_by(Article.score.desc(), Article.created_at.desc())\
+            .limit(limit)\
+            .execution_options(yield_per=self.YIELD_PER)
+        return [dict(row._mapping) for row in rows]
     
     def get_stats(self) -> Dict:
-        # Get statistics about articles
+        # Get statistics about articles (cached for STATS_TTL seconds)
+        cached = self._stats_cache.get('stats')
+        if cached is not None:
+            return cached
+        
         session = self.db.get_session()
         
-        try:
-            total_articles = session.query(Article).count()
-            avg_score = session.query(func.avg(Article.score)).scalar() or 0
-            max_score = session.query(func.max(Article.score)).scalar() or 0
-            total_comments = session.query(func.sum(Article.comment_count)).scalar() or 0
-            min_date = session.query(func.min(Article.created_at)).scalar()
-            max_date = session.query(func.max(Article.created_at)).scalar()
-            
-            return {
-                'total_articles': total_articles,
-                'average_score': round(float(avg_score), 2),
-                'max_score': max_score,
-                'total_comments': total_comments,
-                'earliest_article_date': min_date.isoformat() if min_date else None,
-                'latest_article_date': max_date.isoformat() if max_date else None
-            }
-        finally:
-            session.close()
+        # All aggregates in a single pass over the table
+        total_articles, avg_score, max_score, total_comments, min_date, max_date = session.query(
+            func.count(Article.id),
+            func.avg(Article.score),
+            func.max(Article.score),
+            func.sum(Article.comment_count),
+            func.min(Article.created_at),
+            func.max(Article.created_at)
+        ).one()
+        
+        stats = {
+            'total_articles': total_articles,
+            'average_score': round(float(avg_score or 0), 2),
+            'max_score': max_score or 0,
+            'total_comments': total_comments or 0,
+            'earliest_article_date': min_date.isoformat() if min_date else None,
+            'latest_article_date': max_date.isoformat() if max_date else None
+        }
+        self._stats_cache.set('stats', stats)
+        return stats
 
@@ -1,11 +1,20 @@
 # Chunking Service - Split articles into searchable chunks
 import tiktoken
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import logging
-import json
+import functools
+import orjson
 
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=8)
+def _get_encoder(model: str) -> tiktoken.Encoding:
+    # Get the shared tiktoken encoder for model (BPE tables are loaded once per process). Unknown models fall back to cl100k_base
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
 
 class ChunkingService:
     # Service class for chunking articles into searchable segments
@@ -22,21 +31,34 @@ class ChunkingService:
         
         # Try to initialize tiktoken encoding
         try:
-            self._encoding = tiktoken.encoding_for_model(model)
+            self._encoding = _get_encoder(model)
         except Exception as e:
             logger.warning(f"Failed to initialize tiktoken encoding: {e}. Using fallback.")
+        
+        # Pick the counting path once here instead of re-checking it per call
+        self._count = self._count_with_tiktoken if self._encoding else self._count_fallback
+        
+        # Cost of the paragraph separator used when packing content chunks, counted once
+        self._separator_tokens = self.count_tokens("\n\n")
     
     def count_tokens(self, text: str) -> int:
         # Count tokens in text using tiktoken. Args: text: Text to count tokens for. Returns: Token count
-        if self._encoding:
-            try:
-                return len(self._encoding.encode(text))
-            except Exception as e:
-                logger.warning(f"Error counting tokens: {e}. Using fallback.")
-        
+        return self._count(text)
+    
+    def _count_with_tiktoken(self, text: str) -> int:
+        # encode_ordinary treats special-token text like "<|endoftext|>" as plain text, so it cannot raise on scraped content
+        return len(self._encoding.encode_ordinary(text))
+    
+    def _count_fallback(self, text: str) -> int:
         # Fallback: approximate 1 token = 4 characters
         return len(text) // self.CHARS_PER_TOKEN
     
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        # Count tokens for many texts in one batched tiktoken call. Args: texts: Texts to count. Returns: Token count per text
+        if self._encoding:
+            return [len(tokens) for tokens in self._encoding.encode_ordinary_batch(texts)]
+        return [self._count_fallback(text) for text in texts]
+    
     def chunk_article(
         self,
         title: str, 
@@ -45,7 +67,7 @@ class ChunkingService:
         author: Optional[str] = None,
         score: Optional[int] = None,
         comment_count: Optional[int] = None,
-        tags: Optional[str] = None,
+        tags: Optional[Union[str, List[str]]] = None,
         created_at: Optional[str] = None,
         url: Optional[str] = None,
         max_tokens: Optional[int] = None
@@ -59,11 +81,17 @@ class ChunkingService:
             title, summary, author, score, comment_count, tags, created_at, url
         )
         
+        # Headers are short templated text where chars/4 is close enough; only pay for
+        # an exact count when the header is big enough for the limit to matter
+        header_tokens = len(header_text) // self.CHARS_PER_TOKEN
+        if header_tokens >= max_tokens // 2:
+            header_tokens = self.count_tokens(header_text)
+        
         chunks.append({
             'chunk_text': header_text,
             'chunk_type': 'header',
             'chunk_index': 0,
-            'token_count': self.count_tokens(header_text)
+            'token_count': header_tokens
         })
         
         # CHUNK 2+: Content chunks (for Stage 2 detailed search)
@@ -81,7 +109,7 @@ class ChunkingService:
         author: Optional[str],
         score: Optional[int],
         comment_count: Optional[int],
-        tags: Optional[str],
+        tags: Optional[Union[str, List[str]]],
         created_at: Optional[str],
         url: Optional[str]
     ) -> str:
@@ -101,13 +129,19 @@ class ChunkingService:
             header_parts.append(f"Published: {created_at}")
         
         if tags:
-            try:
-                tags_list = json.loads(tags) if isinstance(tags, str) else tags
-                if tags_list:
-                    tags_str = ", ".join(tags_list)
-                    header_parts.append(f"Tags: {tags_str}")
-            except Exception:
-                header_parts.append(f"Tags: {tags}")
+            # Tags arrive as a JSON array string from the DB; already-parsed lists skip decoding
+            if isinstance(tags, str):
+                try:
+                    tags_list = orjson.loads(tags)
+                except orjson.JSONDecodeError:
+                    tags_list = None
+                if not isinstance(tags_list, list):
+                    # Not a JSON array - keep the raw string as before
+                    tags_list = [tags]
+            else:
+                tags_list = tags
+            if tags_list:
+                header_parts.append("Tags: " + ", ".join(map(str, tags_list)))
         
         if url:
             header_parts.append(f"URL: {url}")
@@ -118,40 +152,42 @@ class ChunkingService:
         return "\n".join(header_parts)
     
     def _create_content_chunks(self, content: str, max_tokens: int) -> List[Dict]:
-        # Split content into token-limited chunks
+        # Split content into token-limited chunks. All paragraphs are tokenized in one batch and chunks are packed by summing counts
         chunks = []
-        paragraphs = content.split('\n\n')
-        current_chunk = ""
+        paragraphs = [para.strip() for para in content.split('\n\n') if para.strip()]
+        para_token_counts = self.count_tokens_batch(paragraphs)
+        separator_tokens = self._separator_tokens
+        
+        current_parts = []
+        current_tokens = 0
         chunk_index = 1
         
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-            
-            test_chunk = current_chunk + "\n\n" + para if current_chunk else para
-            token_count = self.count_tokens(test_chunk)
+        for para, para_tokens in zip(paragraphs, para_token_counts):
+            # The separator only costs tokens when joining onto an existing chunk
+            added_tokens = para_tokens + separator_tokens if current_parts else para_tokens
             
-            if token_count <= max_tokens:
-                current_chunk = test_chunk
+            if current_tokens + added_tokens <= max_tokens:
+                current_parts.append(para)
+                current_tokens += added_tokens
             else:
-                if current_chunk:
+                if current_parts:
                     chunks.append({
-                        'chunk_text': current_chunk,
+                        'chunk_text': "\n\n".join(current_parts),
                         'chunk_type': 'content',
                         'chunk_index': chunk_index,
-                        'token_count': self.count_tokens(current_chunk)
+                        'token_count': current_tokens
                     })
                     chunk_index += 1
-                current_chunk = para
+                current_parts = [para]
+                current_tokens = para_tokens
         
         # Add the last chunk
-        if current_chunk:
+        if current_parts:
             chunks.append({
-                'chunk_text': current_chunk,
+                'chunk_text': "\n\n".join(current_parts),
                 'chunk_type': 'content',
                 'chunk_index': chunk_index,
-                'token_count': self.count_tokens(current_chunk)
+                'token_count': current_tokens
             })
         
         return chunks
@@ -162,4 +198,5 @@ _default_chunker = ChunkingService()
 
 # Expose module-level functions for backwards compatibility
 count_tokens = _default_chunker.count_tokens
+count_tokens_batch = _default_chunker.count_tokens_batch
 chunk_article = _default_chunker.chunk_article
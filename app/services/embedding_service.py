@@ -6,6 +6,8 @@ from typing import List, Optional
 import logging
 from dotenv import load_dotenv
 import numpy as np
+from app.utils.cache import EmbeddingCache
+from app.utils.concurrency import RateLimiter, get_rate_limiter, parallel_map
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -16,14 +18,55 @@ class EmbeddingService:
     
     DEFAULT_MODEL = "gemini-embedding-001"
     DEFAULT_DIMENSIONS = 1536
+    DEFAULT_CACHE_PATH = ".embcache.sqlite3"
+    # Cached vectors kept (least recently used go first) and seconds each is reused before it is embedded again
+    DEFAULT_CACHE_MAX_ENTRIES = 50000
+    DEFAULT_CACHE_TTL = 30 * 86400
+    # Per-request limits for embed_content: the API accepts at most 100 texts per call,
+    # and the byte cap keeps requests of long chunks well under the payload limit
+    MAX_BATCH_ITEMS = 100
+    MAX_BATCH_BYTES = 200_000
+    # Batches sent to Gemini at the same time
+    MAX_CONCURRENT_BATCHES = 4
+    # embed_content requests per minute across all instances (GEMINI_EMBED_REQUESTS_PER_MINUTE; 0 disables pacing)
+    DEFAULT_REQUESTS_PER_MINUTE = 100
+    # Single query embeddings for search get their own budget (GEMINI_QUERY_EMBED_REQUESTS_PER_MINUTE),
+    # so a chat turn never queues behind an ingestion run
+    DEFAULT_QUERY_REQUESTS_PER_MINUTE = 60
     
     def __init__(self, api_key: Optional[str] = None, 
                  model: str = DEFAULT_MODEL,
-                 dimensions: int = DEFAULT_DIMENSIONS):
-        # Initialize EmbeddingService with Gemini client. Args: api_key: Google API key (defaults to GOOGLE_API_KEY env var), model: Embedding model to use, dimensions: Output dimensionality for embeddings
+                 dimensions: int = DEFAULT_DIMENSIONS,
+                 cache_path: Optional[str] = None):
+        # Initialize EmbeddingService with Gemini client. Args: api_key: Google API key (defaults to GOOGLE_API_KEY env var), model: Embedding model to use, dimensions: Output dimensionality for embeddings, cache_path: SQLite file caching embeddings by text (defaults to EMBEDDING_CACHE_PATH env var; empty disables)
         self.model = model
         self.dimensions = dimensions
         self.client = None
+        self.cache = None
+        # Concurrent batches are paced so ingestion bursts stay under the quota instead of failing with 429.
+        # The burst lets every concurrent batch start at once; pacing only kicks in on sustained load
+        self.rate_limiter = get_rate_limiter(
+            'gemini-embed', float(os.getenv('GEMINI_EMBED_REQUESTS_PER_MINUTE', self.DEFAULT_REQUESTS_PER_MINUTE)),
+            burst=self.MAX_CONCURRENT_BATCHES
+        )
+        self.query_rate_limiter = get_rate_limiter(
+            'gemini-embed-query',
+            float(os.getenv('GEMINI_QUERY_EMBED_REQUESTS_PER_MINUTE', self.DEFAULT_QUERY_REQUESTS_PER_MINUTE)),
+            burst=self.MAX_CONCURRENT_BATCHES
+        )
+        
+        # Embeddings are deterministic per (model, dimensions, text), so repeats are served locally
+        if cache_path is None:
+            cache_path = os.getenv("EMBEDDING_CACHE_PATH", self.DEFAULT_CACHE_PATH)
+        if cache_path:
+            try:
+                self.cache = EmbeddingCache(
+                    cache_path,
+                    ttl=int(os.getenv("EMBEDDING_CACHE_TTL", self.DEFAULT_CACHE_TTL)),
+                    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", self.DEFAULT_CACHE_MAX_ENTRIES))
+                )
+            except Exception as e:
+                logger.warning(f"Failed to open embedding cache at {cache_path}: {e}. Caching disabled.")
         
         # Get API key from parameter or environment
         api_key = api_key or os.getenv("GOOGLE_API_KEY")
@@ -37,52 +80,108 @@ class EmbeddingService:
         else:
             logger.warning("GOOGLE_API_KEY not found in environment variables")
     
-    def generate_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
-        # Generate embeddings for multiple texts using Gemini (batch operation). Normalizes embeddings for accurate semantic similarity. Args: texts: List of text strings to embed. Returns: List of normalized embedding vectors or None for failures
-        if not self.client:
-            logger.error("Gemini client not initialized")
-            return [None] * len(texts)
-        
+    def generate_embeddings(self, texts: List[str], interactive: bool = False) -> List[Optional[np.ndarray]]:
+        # Generate embeddings for multiple texts using Gemini (batch operation). Cached texts skip the API call. Normalizes embeddings for accurate semantic similarity. Args: texts: List of text strings to embed, interactive: Pace against the query budget instead of the ingestion one. Returns: List of normalized float32 embedding vectors (np.ndarray) or None for failures
         if not texts:
             logger.warning("No texts provided for embedding generation")
             return []
         
+        cache_key = f"{self.model}:{self.dimensions}"
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        hits = {}
+        if self.cache:
+            # The cache only saves API calls - a locked or unreadable cache file must not fail the request
+            try:
+                hits = self.cache.get_many(cache_key, texts)
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+        for idx, vector in hits.items():
+            embeddings[idx] = vector
+        
+        missing = [idx for idx in range(len(texts)) if idx not in hits]
+        if not missing:
+            logger.info(f"Served {len(texts)} embeddings from cache")
+            return embeddings
+        
+        if not self.client:
+            logger.error("Gemini client not initialized")
+            return embeddings
+        
+        # Embeddings are deterministic, so duplicate texts in the batch are sent once
+        unique_texts = list(dict.fromkeys(texts[idx] for idx in missing))
+        
+        # Send batches sized for the API concurrently; a failed batch only leaves its own texts as None
+        batches = self._split_batches(unique_texts)
+        vectors = {}
+        rate_limiter = self.query_rate_limiter if interactive else self.rate_limiter
+        batch_results = parallel_map(
+            lambda batch: self._embed_batch(batch, rate_limiter), batches, max_workers=self.MAX_CONCURRENT_BATCHES
+        )
+        for batch, normalized in zip(batches, batch_results):
+            if normalized is None:
+                continue
+            # Rows are views into one float32 matrix - no per-element Python floats
+            vectors.update(zip(batch, normalized))
+            if self.cache:
+                try:
+                    self.cache.set_many(cache_key, list(zip(batch, normalized)))
+                except Exception as e:
+                    logger.warning(f"Failed to cache {len(batch)} embeddings: {e}")
+        
+        for idx in missing:
+            embeddings[idx] = vectors.get(texts[idx])
+        
+        logger.info(f"Generated {len(vectors)}/{len(unique_texts)} embeddings in {len(batches)} batches ({len(hits)} from cache, {len(missing) - len(unique_texts)} duplicates)")
+        return embeddings
+    
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        # Greedily pack texts into batches of at most MAX_BATCH_ITEMS texts and MAX_BATCH_BYTES UTF-8 bytes
+        batches = []
+        current = []
+        current_bytes = 0
+        for text in texts:
+            size = len(text.encode('utf-8'))
+            if current and (len(current) >= self.MAX_BATCH_ITEMS or current_bytes + size > self.MAX_BATCH_BYTES):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(text)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _embed_batch(self, texts: List[str], rate_limiter: RateLimiter) -> Optional[np.ndarray]:
+        # Embed one batch with a single API call, paced by rate_limiter. Returns: Normalized (len(texts), dimensions) float32 array or None on failure
         try:
+            rate_limiter.acquire()
             result = self.client.models.embed_content(
                 model=self.model,
                 contents=texts,
                 config=types.EmbedContentConfig(output_dimensionality=self.dimensions)
             )
             
-            # Extract and normalize embedding vectors
-            embeddings = []
-            for idx, emb in enumerate(result.embeddings):
-                normalized_emb = self._normalize_embedding(emb.values, idx)
-                embeddings.append(normalized_emb)
-            
-            logger.info(f"Generated {len(embeddings)} embeddings successfully")
-            return embeddings
-            
+            # Stack into one float32 matrix and normalize every row in a single pass
+            return self._normalize_embeddings(
+                np.asarray([emb.values for emb in result.embeddings], dtype=np.float32)
+            )
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
-            return [None] * len(texts)
+            return None
     
-    def generate_embedding(self, text: str) -> Optional[List[float]]:
-        # Generate embedding for a single text. Args: text: Text string to embed. Returns: Normalized embedding vector or None if generation fails
-        results = self.generate_embeddings([text])
+    def generate_embedding(self, text: str) -> Optional[np.ndarray]:
+        # Generate embedding for a single text (a search query, paced on the query budget). Args: text: Text string to embed. Returns: Normalized float32 embedding vector or None if generation fails
+        results = self.generate_embeddings([text], interactive=True)
         return results[0] if results else None
     
-    def _normalize_embedding(self, embedding_values: List[float], index: int = 0) -> List[float]:
-        # Normalize an embedding vector for better semantic similarity. Args: embedding_values: Raw embedding values, index: Index for logging purposes. Returns: Normalized embedding vector
-        embedding_values_np = np.array(embedding_values)
-        norm = np.linalg.norm(embedding_values_np)
-        
-        if norm > 0:
-            normed_embedding = embedding_values_np / norm
-            return normed_embedding.tolist()
-        else:
-            logger.warning(f"Zero vector encountered at index {index}, skipping normalization")
-            return embedding_values
+    def _normalize_embeddings(self, embeddings: np.ndarray) -> np.ndarray:
+        # Normalize embedding vectors (rows) to unit length for better semantic similarity. Args: embeddings: (n, dimensions) array. Returns: Normalized array; zero vectors are left unchanged
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        zero_rows = np.flatnonzero(norms[:, 0] == 0)
+        if zero_rows.size:
+            logger.warning(f"Zero vector encountered at index {zero_rows.tolist()}, skipping normalization")
+        embeddings /= np.where(norms > 0, norms, 1)
+        return embeddings
 
 
 # Backwards compatibility: Create singleton instance
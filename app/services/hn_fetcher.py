@@ -1,7 +1,14 @@
 # HackerNews Fetcher Service - Fetch articles from HackerNews API
 import requests
-from typing import List, Dict, Optional
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,20 +19,49 @@ class HNFetcher:
     
     BASE_URL = "https://hacker-news.firebaseio.com/v0"
     DEFAULT_TIMEOUT = 10
+    # Concurrent item requests per fetch_articles call
+    MAX_WORKERS = 16
+    # Keep-alive connections held open to the HN API
+    POOL_SIZE = 32
     
-    def __init__(self, timeout: int = DEFAULT_TIMEOUT):
-        # Initialize HNFetcher service. Args: timeout: Request timeout in seconds
+    def __init__(self, timeout: int = DEFAULT_TIMEOUT, max_workers: int = MAX_WORKERS):
+        # Initialize HNFetcher service. Args: timeout: Request timeout in seconds, max_workers: Concurrent story detail requests
         self.timeout = timeout
+        self.max_workers = max_workers
+        # One pooled session so requests reuse TCP/TLS connections instead of reconnecting per story
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_SIZE,
+            pool_maxsize=self.POOL_SIZE,
+            max_retries=Retry(total=5, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Last (ETag, full id list) per list URL, for conditional GETs
+        self._list_cache: Dict[str, Tuple[str, List[int]]] = {}
+        self._list_cache_lock = threading.Lock()
     
     def fetch_story_ids(self, story_type: str, limit: int = 10) -> List[int]:
         # Fetch story IDs from HackerNews API. Args: story_type: Type of stories ('top', 'new', 'best'), limit: Maximum number of story IDs to fetch. Returns: List of story IDs
         url = f"{self.BASE_URL}/{story_type}stories.json"
+        with self._list_cache_lock:
+            cached = self._list_cache.get(url)
+        # Firebase only sends ETags when asked; an unchanged list then comes back as an empty 304
+        headers = {'X-Firebase-ETag': 'true'}
+        if cached:
+            headers['If-None-Match'] = cached[0]
         try:
-            response = requests.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+            if response.status_code == 304 and cached:
+                return cached[1][:limit]
             response.raise_for_status()
-            story_ids = response.json()
+            story_ids = orjson.loads(response.content)
+            etag = response.headers.get('ETag')
+            if etag:
+                with self._list_cache_lock:
+                    self._list_cache[url] = (etag, story_ids)
             return story_ids[:limit]
-        except requests.RequestException as e:
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
             logger.error(f"Error fetching {story_type} stories: {e}")
             return []
     
@@ -45,35 +81,49 @@ class HNFetcher:
         # Fetch detailed information for a specific story. Args: story_id: HackerNews story ID. Returns: Story details dictionary or None if fetch fails
         url = f"{self.BASE_URL}/item/{story_id}.json"
         try:
-            response = requests.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            return orjson.loads(response.content)
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
             logger.error(f"Error fetching story {story_id}: {e}")
             return None
     
+    def iter_articles(self, story_ids: List[int], story_type: str = 'top') -> Iterator[Dict]:
+        # Yield article dictionaries for story IDs as their details arrive, in story_ids order. Args: story_ids: List of HackerNews story IDs, story_type: Type of stories (for metadata only). Returns: Iterator of article dictionaries with structured data
+        if not story_ids:
+            return
+        
+        # Item requests are independent, so overlap them. Ids are submitted in a sliding window of 2 * workers
+        # futures instead of all up front, so a slow consumer or an early stop leaves little queued work
+        workers = min(self.max_workers, len(story_ids))
+        ids = iter(story_ids)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque(executor.submit(self.fetch_story_details, story_id) for story_id in islice(ids, workers * 2))
+            try:
+                while pending:
+                    story = pending.popleft().result()
+                    # Refill before yielding, so the pool keeps working while the caller handles this story
+                    for story_id in islice(ids, 1):
+                        pending.append(executor.submit(self.fetch_story_details, story_id))
+                    if story and story.get('type') == 'story':
+                        yield {
+                            'hn_id': story.get('id'),
+                            'title': story.get('title', 'No title'),
+                            'url': story.get('url', ''),
+                            'author': story.get('by', 'Unknown'),
+                            'score': story.get('score', 0),
+                            'comment_count': story.get('descendants', 0),
+                            'created_at': datetime.fromtimestamp(story.get('time', 0)) if story.get('time') else None,
+                            'tags': None  # Tags will be generated later when content is scraped
+                        }
+            finally:
+                # The caller stopped early: drop requests that haven't started
+                for future in pending:
+                    future.cancel()
+    
     def fetch_articles(self, story_ids: List[int], story_type: str = 'top') -> List[Dict]:
         # Fetch article details for multiple story IDs. Args: story_ids: List of HackerNews story IDs, story_type: Type of stories (for metadata only). Returns: List of article dictionaries with structured data
-        articles = []
-        
-        for story_id in story_ids:
-            story = self.fetch_story_details(story_id)
-            if story and story.get('type') == 'story':
-                url = story.get('url', '')
-                title = story.get('title', 'No title')
-                
-                article = {
-                    'hn_id': story.get('id'),
-                    'title': title,
-                    'url': url,
-                    'author': story.get('by', 'Unknown'),
-                    'score': story.get('score', 0),
-                    'comment_count': story.get('descendants', 0),
-                    'created_at': datetime.fromtimestamp(story.get('time', 0)) if story.get('time') else None,
-                    'tags': None  # Tags will be generated later when content is scraped
-                }
-                articles.append(article)
-        
+        articles = list(self.iter_articles(story_ids, story_type))
         logger.info(f"Fetched {len(articles)} articles out of {len(story_ids)} story IDs")
         return articles
     
@@ -84,12 +134,14 @@ class HNFetcher:
     
     def fetch_trending_articles(self, limit: int = 10) -> List[Dict]:
         # Fetch trending articles by combining top and new stories. Args: limit: Maximum number of articles to fetch. Returns: List of trending articles sorted by score
-        # Get top stories and new stories
-        top_ids = self.fetch_top_story_ids(limit * 2)
-        new_ids = self.fetch_new_story_ids(limit * 2)
+        # Get top stories and new stories (both list requests in flight at once)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            top_future = executor.submit(self.fetch_top_story_ids, limit * 2)
+            new_future = executor.submit(self.fetch_new_story_ids, limit * 2)
+            top_ids, new_ids = top_future.result(), new_future.result()
         
-        # Combine and deduplicate
-        all_ids = list(set(top_ids + new_ids))[:limit * 2]
+        # Combine and deduplicate, keeping top stories ahead of new ones when truncating
+        all_ids = list(dict.fromkeys(top_ids + new_ids))[:limit * 2]
         
         articles = self.fetch_articles(all_ids, 'trending')
         
@@ -116,6 +168,7 @@ fetch_top_story_ids = _default_fetcher.fetch_top_story_ids
 fetch_new_story_ids = _default_fetcher.fetch_new_story_ids
 fetch_best_story_ids = _default_fetcher.fetch_best_story_ids
 fetch_story_details = _default_fetcher.fetch_story_details
+iter_articles = _default_fetcher.iter_articles
 fetch_articles = _default_fetcher.fetch_articles
 fetch_top_articles = _default_fetcher.fetch_top_articles
 fetch_trending_articles = _default_fetcher.fetch_trending_articles
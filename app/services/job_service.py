@@ -0,0 +1,88 @@
+# Job Service - Run long ingestion work in the background and track its status
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import delete, select, update
+from app.database.connection import Database
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    # Job queue: jobs run on a small in-process thread pool, while their status lives in the jobs table.
+    # With several server workers (gunicorn --preload), a poll may land on any worker, not just the one running the job
+
+    MAX_WORKERS = 2
+    MAX_TRACKED_JOBS = 200
+    # Seconds after which a job still queued or running is presumed lost with a worker that died
+    STALE_AFTER = 3600
+
+    def __init__(self, db: Database, max_workers: int = MAX_WORKERS, max_tracked_jobs: int = MAX_TRACKED_JOBS,
+                 stale_after: float = STALE_AFTER):
+        # Initialize JobService. Args: db: Database holding job status, max_workers: Jobs run concurrently in this process, max_tracked_jobs: Finished jobs kept for status polling, stale_after: Seconds before an unfinished job is marked failed
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.max_tracked_jobs = max_tracked_jobs
+        self.stale_after = stale_after
+        # Jobs a previous (crashed or restarted) worker left unfinished would otherwise poll as queued/running forever.
+        # Only old ones: other live workers may still be running recent jobs
+        self._fail_stale()
+
+    def submit_job(self, func: Callable[..., Any], *args, **kwargs) -> str:
+        # Queue func(*args, **kwargs) for background execution. Returns: job id to poll with get_job
+        job_id = uuid.uuid4().hex
+        with self.db.session_scope() as session:
+            session.add(Job(id=job_id, status='queued', created_at=datetime.utcnow()))
+        self._prune()
+        self._fail_stale()
+        self.executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Get a snapshot of a job's status. Returns: Job dict or None if the id is unknown
+        with self.db.session_scope() as session:
+            job = session.get(Job, job_id)
+            return job.to_dict() if job else None
+
+    def _run(self, job_id: str, func: Callable[..., Any], args: tuple, kwargs: dict):
+        self._update(job_id, status='running')
+        try:
+            result = func(*args, **kwargs)
+            self._update(job_id, status='finished', result=result, finished_at=datetime.utcnow())
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+
+    def _update(self, job_id: str, **fields):
+        try:
+            with self.db.session_scope() as session:
+                session.execute(update(Job).where(Job.id == job_id).values(**fields))
+        except Exception as e:
+            # Runs on a pool thread - nothing above would see the exception
+            logger.error(f"Failed to update job {job_id}: {e}")
+
+    def _prune(self):
+        # Drop the oldest finished jobs once more than max_tracked_jobs finished jobs are stored
+        finished = Job.status.in_(('finished', 'failed'))
+        keep = select(Job.id).where(finished).order_by(Job.created_at.desc()).limit(self.max_tracked_jobs)
+        try:
+            with self.db.session_scope() as session:
+                session.execute(delete(Job).where(finished, Job.id.not_in(keep)))
+        except Exception as e:
+            logger.warning(f"Failed to prune finished jobs: {e}")
+
+    def _fail_stale(self):
+        # Mark jobs queued or running for longer than stale_after as failed
+        now = datetime.utcnow()
+        try:
+            with self.db.session_scope() as session:
+                session.execute(
+                    update(Job)
+                    .where(Job.status.in_(('queued', 'running')), Job.created_at < now - timedelta(seconds=self.stale_after))
+                    .values(status='failed', error='Job did not finish: its worker stopped', finished_at=now)
+                )
+        except Exception as e:
+            logger.warning(f"Failed to expire stale jobs: {e}")
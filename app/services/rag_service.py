@@ -1,24 +1,133 @@
 # RAG Service - Handles Retrieval-Augmented Generation operations
 import os
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, NamedTuple, Optional, Tuple
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from sqlalchemy import select
-from app.database.connection import Database
-from app.config import Config
-from app.models.article_chunk import ArticleChunk
+from sqlalchemy import Integer, bindparam, cast, func, select, text
+from app.database.connection import get_db
+from app.models.article_chunk import ArticleChunk, binary_quantize
 from app.models.article import Article
 from app.services.embedding_service import generate_embedding
+from app.utils.cache import SemanticCache
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# HNSW candidate list size per search - higher improves recall at the cost of latency
+HNSW_EF_SEARCH = 40
+# Largest hnsw.ef_search pgvector accepts; also caps the coarse candidate count, which can't exceed it
+HNSW_MAX_EF_SEARCH = 1000
+# Binary-quantized candidates fetched per requested result before exact cosine re-ranking
+RERANK_FACTOR = 20
 
-def search_headers(query: str, top_k: int = 10):
-    # Search headers using cosine similarity. Args: query: The search query text, top_k: Number of top results to return (default: 10). Returns: List of tuples: (chunk_text, article_title, similarity_score, article_url)
-    # Initialize database
-    db = Database(Config.DATABASE_URL)
-    session = db.get_session()
+# Recent search results per top_k, reused for repeated and near-duplicate queries
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_SIMILARITY = 0.95
+QUERY_CACHE_TTL = 300
+_query_caches: Dict[int, SemanticCache] = {}
+
+# Static system prompt, kept byte-identical across calls so it stays a cacheable prompt prefix
+SYSTEM_PROMPT = """You are a helpful AI assistant with access to a knowledge base of HackerNews articles.
+
+When provided with context from the knowledge base, use it to answer questions accurately and cite the sources.
+If the context is relevant, reference the article titles and provide the URLs.
+If the context is not relevant to the question, you can answer based on your general knowledge."""
+
+# Turns answered from the conversation alone: whole-message small talk, and questions about the chat itself
+_SMALL_TALK_RE = re.compile(
+    r"(?:hi|hello|hey|thanks|thank you|thx|ty|ok(?:ay)?|cool|great|nice|awesome|got it|"
+    r"bye|goodbye|yes|no|yep|nope|sure)(?:\s+(?:so much|a lot|again|there))?[\s!.,:)]*",
+    re.IGNORECASE
+)
+_CONVERSATION_META_RE = re.compile(
+    r"\b(?:what (?:did|was) (?:i|you) (?:just )?(?:ask|say|said|mean)|(?:repeat|rephrase) (?:that|your (?:last )?answer)|"
+    r"say (?:that|it) again|summari[sz]e (?:our|this|the) (?:conversation|chat))\b",
+    re.IGNORECASE
+)
+
+
+class HeaderHit(NamedTuple):
+    # One header search result - a tuple rather than a dict per row, read by attribute
+    header_text: str
+    article_title: str
+    article_url: str
+    hn_id: int
+    article_id: int
+    similarity_score: float
+
+
+def _get_query_cache(top_k: int) -> SemanticCache:
+    cache = _query_caches.get(top_k)
+    if cache is None:
+        cache = _query_caches.setdefault(
+            top_k, SemanticCache(QUERY_CACHE_SIZE, QUERY_CACHE_SIMILARITY, QUERY_CACHE_TTL)
+        )
+    return cache
+
+
+def _header_search_stmt(query_vector, top_k: int):
+    # Two-stage nearest header chunks to query_vector (a vector or bound parameter), closest first:
+    # a coarse Hamming-distance pass over binary-quantized embeddings (HNSW-indexed) picks
+    # top_k * RERANK_FACTOR candidates, which are then re-ranked exactly. Embeddings are stored unit-length, so the
+    # re-rank uses negative inner product (<#>): same order as cosine distance without per-row norms and division
+    candidates = select(ArticleChunk.id).where(
+        ArticleChunk.chunk_type == 'header'
+    ).where(
+        ArticleChunk.embedding.isnot(None)
+    ).order_by(
+        binary_quantize(ArticleChunk.embedding).hamming_distance(
+            binary_quantize(cast(query_vector, ArticleChunk.embedding.type))
+        )
+    ).limit(func.least(top_k * RERANK_FACTOR, HNSW_MAX_EF_SEARCH))
+    
+    return select(
+        ArticleChunk.chunk_text,
+        Article.title,
+        Article.url,
+        Article.hn_id,
+        ArticleChunk.article_id,
+        ArticleChunk.embedding.max_inner_product(query_vector).label('distance')
+    ).join(
+        Article,
+        Article.hn_id == ArticleChunk.article_id
+    ).where(
+        ArticleChunk.id.in_(candidates)
+    ).order_by(
+        'distance'
+    ).limit(top_k)
+
+
+# search_headers' statement, built once: the query vector and top_k are bound per call, so each search skips
+# rebuilding the select and hits SQLAlchemy's compiled-SQL cache
+_HEADER_SEARCH_STMT = _header_search_stmt(
+    bindparam('query_vector', type_=ArticleChunk.embedding.type),
+    bindparam('top_k', type_=Integer)
+)
+
+
+def _set_ef_search(session, top_k: int):
+    # HNSW returns at most ef_search rows, so the coarse pass needs room for every candidate.
+    # SET LOCAL scopes it to this transaction so pooled connections keep the server default
+    ef_search = min(max(HNSW_EF_SEARCH, top_k * RERANK_FACTOR), HNSW_MAX_EF_SEARCH)
+    session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+
+
+def _format_header_row(row) -> 'HeaderHit':
+    # Convert distance (negative inner product) to similarity score - equal to cosine similarity for unit vectors
+    return HeaderHit(row.chunk_text, row.title, row.url, row.hn_id, row.article_id, -row.distance)
+
+
+def search_headers(query: str, top_k: int = 10) -> List[HeaderHit]:
+    # Search headers using cosine similarity. Args: query: The search query text, top_k: Number of top results to return (default: 10). Returns: List of HeaderHit (header_text, article_title, article_url, hn_id, article_id, similarity_score)
+    # Exact repeat of a recent query: no embedding call and no DB query. Results are cached as a tuple of
+    # (immutable) HeaderHits and every caller gets its own list, so one caller's edits can't reach the next
+    query_cache = _get_query_cache(top_k)
+    cache_key = query.strip().lower()
+    cached_results = query_cache.get(cache_key)
+    if cached_results is not None:
+        logger.info(f"Serving cached results for query: '{query}'")
+        return list(cached_results)
     
     try:
         # Generate embedding for the query (automatically normalized for accurate similarity)
@@ -29,51 +138,43 @@ def search_headers(query: str, top_k: int = 10):
             logger.error("Failed to generate embedding for query")
             return []
         
+        # Near-duplicate of a recent query: reuse its results and skip the vector search
+        cached_results = query_cache.get_similar(query_embedding)
+        if cached_results is not None:
+            logger.info(f"Serving results of a similar cached query for: '{query}'")
+            return list(cached_results)
+        
         # Perform cosine similarity search on headers
-        # Using pgvector's cosine distance operator <=>
+        # Using pgvector's negative inner product operator <#> (cosine for normalized embeddings)
         # Lower distance = higher similarity
         logger.info("Performing cosine similarity search on headers...")
         
-        query_stmt = select(
-            ArticleChunk.chunk_text,
-            Article.title,
-            Article.url,
-            Article.hn_id,
-            ArticleChunk.article_id,
-            ArticleChunk.embedding.cosine_distance(query_embedding).label('distance')
-        ).join(
-            Article,
-            Article.hn_id == ArticleChunk.article_id
-        ).where(
-            ArticleChunk.chunk_type == 'header'
-        ).where(
-            ArticleChunk.embedding.isnot(None)
-        ).order_by(
-            'distance'
-        ).limit(top_k)
-        
-        results = session.execute(query_stmt).all()
-        
-        # Convert distance to similarity score (1 - distance)
-        formatted_results = [
-            {
-                'header_text': row[0],
-                'article_title': row[1],
-                'article_url': row[2],
-                'hn_id': row[3],
-                'article_id': row[4],
-                'similarity_score': 1 - row[5]  # Convert distance to similarity
-            }
-            for row in results
-        ]
+        with get_db().session_scope() as session:
+            _set_ef_search(session, top_k)
+            results = session.execute(
+                _HEADER_SEARCH_STMT, {'query_vector': query_embedding, 'top_k': top_k}
+            ).all()
         
+        formatted_results = [_format_header_row(row) for row in results]
+        
+        if formatted_results:
+            query_cache.set(cache_key, query_embedding, tuple(formatted_results))
         return formatted_results
         
     except Exception as e:
         logger.error(f"Error during search: {e}")
         return []
-    finally:
-        session.close()
+
+
+def _needs_retrieval(user_prompt: str, conversation_history: List[Dict]) -> bool:
+    # Cheap router: False when the turn can be answered without the knowledge base, saving the embedding call and vector search
+    prompt = user_prompt.strip()
+    if not prompt or _SMALL_TALK_RE.fullmatch(prompt):
+        return False
+    # Questions about the conversation itself only make sense once there is one
+    if conversation_history and _CONVERSATION_META_RE.search(prompt):
+        return False
+    return True
 
 
 class RAGService:
@@ -93,15 +194,14 @@ class RAGService:
             self.llm = ChatGoogleGenerativeAI(
                 model=self.model,
                 google_api_key=self.api_key,
-                temperature=self.temperature,
-                convert_system_message_to_human=True
+                temperature=self.temperature
             )
             logger.info(f"LLM initialized successfully with model: {self.model}")
         except Exception as e:
             logger.error(f"Failed to initialize LLM: {e}")
             raise
     
-    def retrieve_context(self, query: str, top_k: int = 4) -> List[Dict]:
+    def retrieve_context(self, query: str, top_k: int = 4) -> List[HeaderHit]:
         # Retrieve relevant context from knowledge base. Args: query: User query, top_k: Number of results to retrieve. Returns: List of retrieved headers with metadata
         try:
             retrieved_headers = search_headers(query, top_k=top_k)
@@ -111,70 +211,95 @@ class RAGService:
             logger.error(f"Error retrieving context: {e}")
             return []
     
-    def build_context_string(self, retrieved_headers: List[Dict]) -> str:
+    def _retrieve_if_needed(self, user_prompt: str, conversation_history: List[Dict]) -> List[HeaderHit]:
+        # Retrieve context unless the router decides the turn doesn't need the knowledge base
+        if not _needs_retrieval(user_prompt, conversation_history):
+            logger.info(f"Skipping retrieval for conversational turn: {user_prompt[:50]}")
+            return []
+        return self.retrieve_context(user_prompt)
+    
+    def build_context_string(self, retrieved_headers: List[HeaderHit]) -> str:
         # Build context string from retrieved headers. Args: retrieved_headers: List of retrieved header results. Returns: Formatted context string
         if not retrieved_headers:
             return ""
         
-        context = "\n\n**CONTEXT FROM KNOWLEDGE BASE:**\n\n"
+        # Collect the pieces and join once rather than re-copying the string on every +=
+        parts = ["\n\n**CONTEXT FROM KNOWLEDGE BASE:**\n\n"]
         for idx, result in enumerate(retrieved_headers, 1):
-            context += f"Article {idx}: {result['article_title']}\n"
-            context += f"Header: {result['header_text']}\n"
-            context += f"URL: {result['article_url']}\n"
-            context += f"Relevance Score: {result['similarity_score']:.3f}\n\n"
+            parts.append(
+                f"Article {idx}: {result.article_title}\n"
+                f"Header: {result.header_text}\n"
+                f"URL: {result.article_url}\n"
+                f"Relevance Score: {result.similarity_score:.3f}\n\n"
+            )
         
-        return context
+        return "".join(parts)
     
-    def generate_response(
+    def _build_messages(
         self,
         user_prompt: str,
         conversation_history: List[Dict],
-        retrieved_headers: List[Dict]
-    ) -> str:
-        # Generate response using LLM with RAG. Args: user_prompt: Current user prompt, conversation_history: Previous conversation messages, retrieved_headers: Retrieved context. Returns: Generated response text
+        retrieved_headers: List[HeaderHit]
+    ) -> List:
+        # Build the LLM message list: system prompt, conversation history, then the user prompt with retrieved context
         # Build context
         context = self.build_context_string(retrieved_headers)
         
-        # System prompt
-        system_prompt = """You are a helpful AI assistant with access to a knowledge base of HackerNews articles. 
-        
-When provided with context from the knowledge base, use it to answer questions accurately and cite the sources.
-If the context is relevant, reference the article titles and provide the URLs.
-If the context is not relevant to the question, you can answer based on your general knowledge."""
-        
-        # Build messages
-        messages = [SystemMessage(content=system_prompt)]
+        # Build messages: only the last turn changes between calls, so the system prompt and
+        # history form a byte-identical prefix the provider can serve from its prompt cache
+        messages = [SystemMessage(content=SYSTEM_PROMPT)]
         
-        # Add conversation history
+        # Add conversation history (stored without retrieved context, so it never changes)
         for msg in conversation_history:
             if msg["role"] == "user":
                 messages.append(HumanMessage(content=msg["content"]))
             elif msg["role"] == "assistant":
                 messages.append(AIMessage(content=msg["content"]))
         
-        # Add current user message with context
+        # Add current user message with context - Gemini only accepts a system message in first
+        # position, so per-turn context rides in the final user turn rather than its own message
         user_message_with_context = user_prompt
         if context:
             user_message_with_context = f"{context}\n\n**USER QUESTION:**\n{user_prompt}"
         
         messages.append(HumanMessage(content=user_message_with_context))
+        return messages
+    
+    def stream_response(
+        self,
+        user_prompt: str,
+        conversation_history: List[Dict],
+        retrieved_headers: List[HeaderHit]
+    ) -> Iterator[str]:
+        # Generate response using LLM with RAG, yielding text as it arrives. Args: user_prompt: Current user prompt, conversation_history: Previous conversation messages, retrieved_headers: Retrieved context. Returns: Iterator of response text pieces
+        messages = self._build_messages(user_prompt, conversation_history, retrieved_headers)
         
-        # Get response from LLM
+        # Stream the response from the LLM so callers can render the first tokens immediately
         try:
-            response = self.llm.invoke(messages)
-            return response.content
+            for chunk in self.llm.stream(messages):
+                if chunk.content:
+                    yield chunk.content
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             raise
     
+    def generate_response(
+        self,
+        user_prompt: str,
+        conversation_history: List[Dict],
+        retrieved_headers: List[HeaderHit]
+    ) -> str:
+        # Generate response using LLM with RAG. Args: user_prompt: Current user prompt, conversation_history: Previous conversation messages, retrieved_headers: Retrieved context. Returns: Generated response text
+        return "".join(self.stream_response(user_prompt, conversation_history, retrieved_headers))
+    
     def process_query(
         self,
         user_prompt: str,
         conversation_history: List[Dict]
-    ) -> Tuple[str, List[Dict]]:
+    ) -> Tuple[str, List[HeaderHit]]:
         # Complete RAG pipeline: retrieve + generate. Args: user_prompt: User query, conversation_history: Previous messages. Returns: Tuple of (response_text, retrieved_headers)
-        # Step 1: Retrieve
-        retrieved_headers = self.retrieve_context(user_prompt)
+        # Step 1: Retrieve (skipped for small talk and questions about the conversation)
+        retrieved_headers = self._retrieve_if_needed(user_prompt, conversation_history)
         
         # Step 2: Generate
         response_text = self.generate_response(
@@ -184,4 +309,12 @@ If the context is not relevant to the question, you can answer based on your gen
         )
         
         return response_text, retrieved_headers
-
+    
+    def stream_query(
+        self,
+        user_prompt: str,
+        conversation_history: List[Dict]
+    ) -> Tuple[Iterator[str], List[HeaderHit]]:
+        # Streaming RAG pipeline: retrieve now, generate lazily. Args: user_prompt: User query, conversation_history: Previous messages. Returns: Tuple of (response text iterator, retrieved_headers)
+        retrieved_headers = self._retrieve_if_needed(user_prompt, conversation_history)
+        return self.stream_response(user_prompt, conversation_history, retrieved_headers), retrieved_headers
@@ -1,10 +1,23 @@
 # Scraping Service - Extract article content from URLs
 from newspaper import Article
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from app.utils.cache import ScrapeCache
+from app.utils.concurrency import parallel_map
 from typing import Optional
+import requests
 import logging
+import os
+import re
 
 logger = logging.getLogger(__name__)
 
+# Page furniture dropped before text extraction by the lxml parser
+BOILERPLATE_TAGS = ('script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'iframe')
+# Block elements whose text becomes one line of output
+TEXT_BLOCK_XPATH = './/p|.//h1|.//h2|.//h3|.//h4|.//h5|.//h6|.//li|.//pre'
+_WHITESPACE_RE = re.compile(r'\s+')
+
 
 class ScrapingService:
     # Service class for scraping article content from web URLs
@@ -12,14 +25,49 @@ class ScrapingService:
     DEFAULT_TIMEOUT = 10
     MAX_CONTENT_LENGTH = 50000
     MIN_CONTENT_LENGTH = 50
+    # Concurrent downloads per scrape_multiple call
+    MAX_WORKERS = 16
+    # Keep-alive connections held open per host
+    POOL_SIZE = 32
+    # HTML-to-text backends: 'newspaper' (BeautifulSoup-based, default) or 'lxml' (single C parse, no NLP extras)
+    PARSERS = ('newspaper', 'lxml')
+    DEFAULT_PARSER = 'newspaper'
+    DEFAULT_CACHE_PATH = ".scrapecache.sqlite3"
+    # Seconds a scraped page is served from cache before it is fetched again
+    DEFAULT_CACHE_TTL = 86400
     
     def __init__(self, timeout: int = DEFAULT_TIMEOUT, 
                  max_length: int = MAX_CONTENT_LENGTH,
-                 min_length: int = MIN_CONTENT_LENGTH):
-        # Initialize ScrapingService. Args: timeout: Request timeout in seconds, max_length: Maximum content length to extract, min_length: Minimum content length to consider valid
+                 min_length: int = MIN_CONTENT_LENGTH,
+                 max_workers: int = MAX_WORKERS,
+                 parser: Optional[str] = None,
+                 cache_path: Optional[str] = None):
+        # Initialize ScrapingService. Args: timeout: Request timeout in seconds, max_length: Maximum content length to extract, min_length: Minimum content length to consider valid, max_workers: Concurrent downloads in scrape_multiple, parser: HTML-to-text backend (defaults to SCRAPER_PARSER env var), cache_path: SQLite file caching scraped text by URL (defaults to SCRAPE_CACHE_PATH env var; empty disables)
         self.timeout = timeout
         self.max_length = max_length
         self.min_length = min_length
+        self.max_workers = max_workers
+        
+        parser = (parser or os.getenv('SCRAPER_PARSER', self.DEFAULT_PARSER)).lower()
+        if parser not in self.PARSERS:
+            logger.warning(f"Unknown scraper parser '{parser}', using {self.DEFAULT_PARSER}")
+            parser = self.DEFAULT_PARSER
+        self.parser = parser
+        
+        # The same URLs come back across fetch cycles, so successful scrapes are served locally until they expire
+        self.cache = None
+        if cache_path is None:
+            cache_path = os.getenv('SCRAPE_CACHE_PATH', self.DEFAULT_CACHE_PATH)
+        if cache_path:
+            try:
+                self.cache = ScrapeCache(cache_path, ttl=int(os.getenv('SCRAPE_CACHE_TTL', self.DEFAULT_CACHE_TTL)))
+            except Exception as e:
+                logger.warning(f"Failed to open scrape cache at {cache_path}: {e}. Caching disabled.")
+        # One pooled session so repeat hosts reuse TCP/TLS connections (newspaper's own download opens a new one each time)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.POOL_SIZE, pool_maxsize=self.POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
     def scrape_article_content(self, url: str) -> Optional[str]:
         # Scrape and extract article content from a URL. Args: url: The URL to scrape. Returns: Extracted article text or None if scraping fails
@@ -27,16 +75,32 @@ class ScrapingService:
             logger.warning("Empty URL provided for scraping")
             return None
         
+        if self.cache:
+            try:
+                cached = self.cache.get(self.parser, url)
+                if cached is not None:
+                    return cached
+            except Exception as e:
+                logger.warning(f"Scrape cache lookup failed for {url}: {e}")
+        
         try:
             # Create article object
             article = Article(url)
             
-            # Download and parse the article
-            article.download()
-            article.parse()
+            # Download through the shared session, then extract text with the configured parser
+            response = self.session.get(
+                url,
+                timeout=self.timeout,
+                headers={'User-Agent': article.config.browser_user_agent}
+            )
+            response.raise_for_status()
             
-            # Get the cleaned article text
-            content = article.text
+            if self.parser == 'lxml':
+                content = self._extract_text_lxml(response.content)
+            else:
+                article.set_html(response.content)
+                article.parse()
+                content = article.text
             
             # Validate content
             if not content or len(content) < self.min_length:
@@ -48,18 +112,44 @@ class ScrapingService:
                 logger.info(f"Truncating content from {url}: {len(content)} -> {self.max_length} chars")
                 content = content[:self.max_length] + '...'
             
+            # Failures are not cached so transient errors are retried on the next fetch
+            if self.cache:
+                try:
+                    self.cache.set(self.parser, url, content)
+                except Exception as e:
+                    logger.warning(f"Failed to cache scraped content for {url}: {e}")
+            
             return content
             
         except Exception as e:
             logger.warning(f"Error scraping content from {url}: {e}")
             return None
     
+    def _extract_text_lxml(self, html: bytes) -> str:
+        # Extract readable text from raw HTML: drop boilerplate, keep the largest <article>/<main> subtree, one line per text block. Args: html: Raw page bytes. Returns: Extracted text (may be empty)
+        doc = lxml_html.fromstring(html)
+        for element in list(doc.iter(*BOILERPLATE_TAGS)):
+            element.drop_tree()
+        
+        # Minimal readability heuristic: the main content usually sits in the longest article/main element
+        candidates = doc.xpath('//article|//main')
+        if candidates:
+            root = max(candidates, key=lambda el: len(el.text_content()))
+        else:
+            body = doc.find('body')
+            root = body if body is not None else doc
+        
+        lines = [_WHITESPACE_RE.sub(' ', block.text_content()).strip() for block in root.xpath(TEXT_BLOCK_XPATH)]
+        text = '\n\n'.join(line for line in lines if line)
+        # Pages without block markup: fall back to all text under the chosen root
+        return text or _WHITESPACE_RE.sub(' ', root.text_content()).strip()
+    
     def scrape_multiple(self, urls: list[str]) -> dict[str, Optional[str]]:
         # Scrape content from multiple URLs. Args: urls: List of URLs to scrape. Returns: Dictionary mapping URLs to scraped content (or None for failures)
-        results = {}
-        for url in urls:
-            results[url] = self.scrape_article_content(url)
-        return results
+        urls = list(dict.fromkeys(urls))
+        
+        # Downloads are network-bound and independent, so overlap them
+        return dict(zip(urls, parallel_map(self.scrape_article_content, urls, max_workers=self.max_workers)))
 
 
 # Backwards compatibility: Create singleton instance
@@ -67,4 +157,5 @@ _default_scraper = ScrapingService()
 
 # Expose module-level function for backwards compatibility
 scrape_article_content = _default_scraper.scrape_article_content
+scrape_multiple = _default_scraper.scrape_multiple
 
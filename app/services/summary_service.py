@@ -1,13 +1,19 @@
 # Summary Service - Generate article summaries and tags using Groq LLM
 from groq import Groq
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
 import os
-import json
+import orjson
 import re
+from app.utils.concurrency import get_rate_limiter, parallel_map
 
 logger = logging.getLogger(__name__)
 
+# Fallback extraction patterns for responses that are not valid JSON
+_SUMMARY_RE = re.compile(r'"summary"\s*:\s*"([^"]+)"', re.IGNORECASE)
+_TAGS_RE = re.compile(r'"tags"\s*:\s*\[([^\]]+)\]', re.IGNORECASE)
+_TAG_ITEM_RE = re.compile(r'["\']([^"\']+)["\']')
+
 
 class SummaryService:
     # Service class for generating article summaries and tags using Groq LLM
@@ -17,11 +23,24 @@ class SummaryService:
     MAX_SUMMARY_LENGTH = 500
     MAX_TAGS = 10
     MIN_CONTENT_LENGTH = 100
+    MAX_COMPLETION_TOKENS = 500
+    # Multi-article prompts: limits per request, and requests in flight at once
+    MAX_BATCH_ITEMS = 5
+    MAX_BATCH_CHARS = 24000
+    MAX_CONCURRENT_BATCHES = 4
+    # Requests per minute allowed to Groq across all instances (GROQ_REQUESTS_PER_MINUTE; 0 disables pacing)
+    DEFAULT_REQUESTS_PER_MINUTE = 30
     
     def __init__(self, api_key: Optional[str] = None, model: str = DEFAULT_MODEL):
         # Initialize SummaryService with Groq client. Args: api_key: Groq API key (defaults to GROQ_API_KEY env var), model: Model to use for generation
         self.model = model
         self.client = None
+        # Concurrent summaries are paced so bursts stay under the account's rate limit instead of failing with 429.
+        # The burst lets every concurrent request start at once; pacing only kicks in on sustained load
+        self.rate_limiter = get_rate_limiter(
+            'groq', float(os.getenv('GROQ_REQUESTS_PER_MINUTE', self.DEFAULT_REQUESTS_PER_MINUTE)),
+            burst=self.MAX_CONCURRENT_BATCHES
+        )
         
         # Get API key from parameter or environment
         api_key = api_key or os.getenv('GROQ_API_KEY')
@@ -46,21 +65,13 @@ class SummaryService:
             return None, None
         
         try:
-            # Truncate content if too long (Groq has token limits)
-            content_preview = content[:self.MAX_CONTENT_LENGTH] if len(content) > self.MAX_CONTENT_LENGTH else content
-            
             prompt = f"""Analyze the following article and provide:
-1. A concise summary (2-3 sentences, maximum 200 words) for RAG metadata search. Focus on key topics, technologies, and main points.
-2. 5-10 relevant tags/keywords as a JSON array. Focus on:
-   - Programming languages, frameworks, and technologies mentioned
-   - Main topics and subject areas
-   - Tools, platforms, or services discussed
-   - Industry or domain (e.g., AI, security, web development, etc.)
+{self._task_description()}
 
 Title: {title}
 
 Content:
-{content_preview}
+{self._content_preview(content)}
 
 Return your response in this exact JSON format (no markdown, no code blocks, just pure JSON):
 {{
@@ -68,23 +79,7 @@ Return your response in this exact JSON format (no markdown, no code blocks, jus
   "tags": ["tag1", "tag2", "tag3"]
 }}"""
             
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.6,
-                max_completion_tokens=500,
-                top_p=1,
-                reasoning_effort="medium",
-                stream=False,
-                stop=None
-            )
-            
-            response = completion.choices[0].message.content.strip()
+            response = self._complete(prompt, self.MAX_COMPLETION_TOKENS)
             
             # Parse JSON response
             return self._parse_llm_response(response)
@@ -93,61 +88,154 @@ Return your response in this exact JSON format (no markdown, no code blocks, jus
             logger.warning(f"Error generating summary and tags: {e}")
             return None, None
     
+    def generate_summaries_and_tags(self, items: List[Tuple[str, str]]) -> List[Tuple[Optional[str], Optional[str]]]:
+        # Generate summaries and tags for many articles, packing several into each LLM call. Args: items: List of (title, content) pairs. Returns: List of (summary, tags_json_string) in items order; (None, None) where generation fails
+        results: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * len(items)
+        if not self.client:
+            logger.warning("Groq client not initialized. Cannot generate summary and tags.")
+            return results
+        
+        # Greedily pack usable items into prompts bounded by item count and content size
+        packs: List[List[int]] = []
+        pack_chars = 0
+        for idx, (_, content) in enumerate(items):
+            if not content or len(content.strip()) < self.MIN_CONTENT_LENGTH:
+                continue
+            size = min(len(content), self.MAX_CONTENT_LENGTH)
+            if not packs or len(packs[-1]) >= self.MAX_BATCH_ITEMS or pack_chars + size > self.MAX_BATCH_CHARS:
+                packs.append([])
+                pack_chars = 0
+            packs[-1].append(idx)
+            pack_chars += size
+        
+        all_pack_results = parallel_map(
+            lambda pack: self._generate_pack([items[i] for i in pack]), packs, max_workers=self.MAX_CONCURRENT_BATCHES
+        )
+        for pack, pack_results in zip(packs, all_pack_results):
+            for idx, result in zip(pack, pack_results):
+                results[idx] = result
+        return results
+    
+    def _generate_pack(self, items: List[Tuple[str, str]]) -> List[Tuple[Optional[str], Optional[str]]]:
+        # One LLM call for a pack of articles; falls back to one call per article if the reply is unusable
+        if len(items) > 1:
+            articles = "\n\n".join(
+                f"### Article {n}\nTitle: {title}\n\nContent:\n{self._content_preview(content)}"
+                for n, (title, content) in enumerate(items, start=1)
+            )
+            prompt = f"""Analyze each of the following {len(items)} articles and provide, for each one:
+{self._task_description()}
+
+{articles}
+
+Return your response as a JSON array with exactly {len(items)} objects, one per article in the order given, in this exact format (no markdown, no code blocks, just pure JSON):
+[
+  {{"summary": "your summary here", "tags": ["tag1", "tag2", "tag3"]}}
+]"""
+            try:
+                data = orjson.loads(self._strip_code_fence(
+                    self._complete(prompt, self.MAX_COMPLETION_TOKENS * len(items))
+                ))
+                if isinstance(data, list) and len(data) == len(items):
+                    return [self._format_result(entry) if isinstance(entry, dict) else (None, None) for entry in data]
+                logger.warning(f"Batched summary response did not match {len(items)} articles, retrying individually")
+            except Exception as e:
+                logger.warning(f"Error generating batched summaries and tags: {e}, retrying individually")
+        
+        return [self.generate_summary_and_tags(title, content) for title, content in items]
+    
+    def _task_description(self) -> str:
+        return """1. A concise summary (2-3 sentences, maximum 200 words) for RAG metadata search. Focus on key topics, technologies, and main points.
+2. 5-10 relevant tags/keywords as a JSON array. Focus on:
+   - Programming languages, frameworks, and technologies mentioned
+   - Main topics and subject areas
+   - Tools, platforms, or services discussed
+   - Industry or domain (e.g., AI, security, web development, etc.)"""
+    
+    def _content_preview(self, content: str) -> str:
+        # Truncate content if too long (Groq has token limits)
+        return content[:self.MAX_CONTENT_LENGTH] if len(content) > self.MAX_CONTENT_LENGTH else content
+    
+    def _complete(self, prompt: str, max_tokens: int) -> str:
+        # Send one chat completion request. Returns: Stripped response text
+        self.rate_limiter.acquire()
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.6,
+            max_completion_tokens=max_tokens,
+            top_p=1,
+            reasoning_effort="medium",
+            stream=False,
+            stop=None
+        )
+        return completion.choices[0].message.content.strip()
+    
+    def _strip_code_fence(self, response: str) -> str:
+        # Remove markdown code blocks if present
+        if response.startswith("```"):
+            response = response.split("```")[1]
+            if response.startswith("json"):
+                response = response[4:]
+        return response.strip()
+    
     def _parse_llm_response(self, response: str) -> Tuple[Optional[str], Optional[str]]:
         # Parse LLM response to extract summary and tags. Args: response: Raw LLM response string. Returns: Tuple of (summary, tags_json_string)
         try:
-            # Remove markdown code blocks if present
-            if response.startswith("```"):
-                response = response.split("```")[1]
-                if response.startswith("json"):
-                    response = response[4:]
-            response = response.strip()
-            
-            data = json.loads(response)
-            summary = data.get('summary', '').strip()
-            tags = data.get('tags', [])
-            
-            # Validate and format summary
-            if summary:
-                if len(summary) > self.MAX_SUMMARY_LENGTH:
-                    summary = summary[:self.MAX_SUMMARY_LENGTH-3] + "..."
-            else:
-                summary = None
-            
-            # Validate and format tags
-            if isinstance(tags, list) and len(tags) > 0:
-                tags = tags[:self.MAX_TAGS]
-                tags_json = json.dumps(tags)
-            else:
-                tags_json = None
+            response = self._strip_code_fence(response)
+            return self._format_result(orjson.loads(response))
             
-            return summary, tags_json
-            
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             # If JSON parsing fails, try to extract from text
             logger.warning(f"Failed to parse combined response as JSON, attempting extraction")
             return self._extract_from_text(response)
     
+    def _format_result(self, data: Dict) -> Tuple[Optional[str], Optional[str]]:
+        # Validate one parsed {summary, tags} object. Returns: Tuple of (summary, tags_json_string)
+        summary = (data.get('summary') or '').strip()
+        tags = data.get('tags', [])
+        
+        # Validate and format summary
+        if summary:
+            if len(summary) > self.MAX_SUMMARY_LENGTH:
+                summary = summary[:self.MAX_SUMMARY_LENGTH-3] + "..."
+        else:
+            summary = None
+        
+        # Validate and format tags
+        if isinstance(tags, list) and len(tags) > 0:
+            tags = tags[:self.MAX_TAGS]
+            tags_json = orjson.dumps(tags).decode()
+        else:
+            tags_json = None
+        
+        return summary, tags_json
+    
     def _extract_from_text(self, response: str) -> Tuple[Optional[str], Optional[str]]:
         # Extract summary and tags from plain text when JSON parsing fails. Args: response: Raw text response. Returns: Tuple of (summary, tags_json_string)
         summary = None
         tags_json = None
         
         # Try to extract summary (look for "summary" field)
-        summary_match = re.search(r'"summary"\s*:\s*"([^"]+)"', response, re.IGNORECASE)
+        summary_match = _SUMMARY_RE.search(response)
         if summary_match:
             summary = summary_match.group(1).strip()
             if len(summary) > self.MAX_SUMMARY_LENGTH:
                 summary = summary[:self.MAX_SUMMARY_LENGTH-3] + "..."
         
         # Try to extract tags array
-        tags_match = re.search(r'"tags"\s*:\s*\[([^\]]+)\]', response, re.IGNORECASE)
+        tags_match = _TAGS_RE.search(response)
         if tags_match:
             tags_str = tags_match.group(1)
-            tag_matches = re.findall(r'["\']([^"\']+)["\']', tags_str)
+            tag_matches = _TAG_ITEM_RE.findall(tags_str)
             if tag_matches:
                 tags = tag_matches[:self.MAX_TAGS]
-                tags_json = json.dumps(tags)
+                tags_json = orjson.dumps(tags).decode()
         
         return summary, tags_json
 
@@ -157,4 +245,5 @@ _default_service = SummaryService()
 
 # Expose module-level function for backwards compatibility
 generate_summary_and_tags = _default_service.generate_summary_and_tags
+generate_summaries_and_tags = _default_service.generate_summaries_and_tags
 
@@ -1,6 +1,18 @@
 # UI Helper - Utility functions for the Streamlit UI
 import re
-from typing import List, Dict
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    # Annotation only - importing rag_service at runtime would pull in the LLM and database stack
+    from app.services.rag_service import HeaderHit
+
+# One greedy character class, so matching is a single forward pass with no backtracking
+# (slashes are already part of the class)
+_URL_RE = re.compile(r'https?://[^\s<>"\'\)\]]+')
+
+# Topic keywords for suggested questions, all matched in one scan per title; the group name is the topic.
+# "AI" stays case-sensitive so words like "said" or "email" don't count
+_TOPIC_RE = re.compile(r'(?P<ml>machine learning|(?-i:\bAI\b))|(?P<python>python|programming)', re.IGNORECASE)
 
 
 class UIHelper:
@@ -9,22 +21,16 @@ class UIHelper:
     @staticmethod
     def extract_urls(text: str) -> List[str]:
         # Extract URLs from text. Args: text: Text to extract URLs from. Returns: List of extracted URLs
-        # Pattern that catches most URLs including those with slashes
-        url_pattern = r'https?://[^\s<>"\'\)\]]+(?:/[^\s<>"\'\)\]]*)?'
-        urls = re.findall(url_pattern, text)
-        
-        # Clean up URLs - remove trailing punctuation
-        cleaned_urls = []
-        for url in urls:
-            url = url.rstrip('.,;:!?')
-            if url:
-                cleaned_urls.append(url)
+        # Most messages contain no links; a substring check skips the regex entirely
+        if not text or 'http' not in text:
+            return []
         
-        return list(set(cleaned_urls))  # Remove duplicates
+        # Clean up URLs (remove trailing punctuation) and remove duplicates, keeping first-seen order
+        return list(dict.fromkeys(url.rstrip('.,;:!?') for url in _URL_RE.findall(text)))
     
     @staticmethod
-    def generate_suggested_questions(retrieved_headers: List[Dict]) -> List[str]:
-        # Generate 3 suggested follow-up questions based on retrieved context. Args: retrieved_headers: List of retrieved header dictionaries. Returns: List of 3 suggested questions
+    def generate_suggested_questions(retrieved_headers: List['HeaderHit']) -> List[str]:
+        # Generate 3 suggested follow-up questions based on retrieved context. Args: retrieved_headers: List of retrieved header results. Returns: List of 3 suggested questions
         if not retrieved_headers or len(retrieved_headers) == 0:
             return []
         
@@ -32,12 +38,13 @@ class UIHelper:
         
         # Take up to 3 articles for suggestions
         for header in retrieved_headers[:3]:
-            article_title = header['article_title']
+            article_title = header.article_title
+            topics = {match.lastgroup for match in _TOPIC_RE.finditer(article_title)}
             
             # Generate question based on article title
-            if "machine learning" in article_title.lower() or "AI" in article_title.lower():
+            if 'ml' in topics:
                 question = f"Tell me more about {article_title[:40]}..."
-            elif "python" in article_title.lower() or "programming" in article_title.lower():
+            elif 'python' in topics:
                 question = f"What are the key points in {article_title[:30]}?"
             else:
                 question = f"Explain more about {article_title[:40]}..."
@@ -1,45 +1,109 @@
 # API Client - Functions to call the Flask API endpoints
+import codecs
+import functools
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Optional
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-
+# Polling settings for background fetch jobs
+JOB_POLL_INTERVAL = 1.0
+JOB_TIMEOUT = 600
+# (connect, read) timeouts for every API call
+REQUEST_TIMEOUT = (3.05, 30)
+
+# Shared keep-alive session: UI pages make many calls back-to-back to the same host.
+# Retry's default allowed_methods skip POST, so fetch jobs are never queued twice.
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False)
+)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+
+def _parse_json(response: requests.Response) -> Dict:
+    # Decode a JSON response body with orjson (stricter than the stdlib parser, so drop any UTF-8 BOM first)
+    content = response.content
+    if content.startswith(codecs.BOM_UTF8):
+        content = content[len(codecs.BOM_UTF8):]
+    return orjson.loads(content)
+
+
+@functools.lru_cache(maxsize=1)
 def get_api_base_url() -> str:
-    # Get API base URL from environment or default
+    # Get API base URL from environment or default (read once; see reset_api_base_url)
     return os.getenv('API_BASE_URL', 'http://localhost:5000/api')
 
 
-def fetch_top_articles(limit: int = 10) -> Dict:
-    # Fetch top articles from HackerNews and store in database
-    response = requests.post(
-        f"{get_api_base_url()}/articles/fetch/top",
+def reset_api_base_url() -> None:
+    # Forget the cached API base URL so the next call re-reads API_BASE_URL
+    get_api_base_url.cache_clear()
+
+
+def get_job(job_id: str) -> Dict:
+    # Get the status and result of a background fetch job
+    response = _session.get(f"{get_api_base_url()}/jobs/{job_id}", timeout=REQUEST_TIMEOUT)
+    return _parse_json(response)
+
+
+def wait_for_job(job_id: str, timeout: float = JOB_TIMEOUT) -> Dict:
+    # Poll a fetch job until it finishes. Returns: Job result with 'success' (same shape fetch endpoints used to return)
+    deadline = time.monotonic() + timeout
+    while True:
+        result = get_job(job_id)
+        if not result.get('success'):
+            return result
+        job = result['job']
+        if job['status'] == 'finished':
+            return {'success': True, **job['result']}
+        if job['status'] == 'failed':
+            return {'success': False, 'error': job['error']}
+        if time.monotonic() >= deadline:
+            return {'success': False, 'error': f"Timed out waiting for job {job_id}"}
+        time.sleep(JOB_POLL_INTERVAL)
+
+
+def _start_fetch(endpoint: str, limit: int, wait: bool) -> Dict:
+    # POST to a fetch endpoint; with wait=True block until the queued job completes
+    response = _session.post(
+        f"{get_api_base_url()}/articles/fetch/{endpoint}",
         json={"limit": limit},
-        headers={"Content-Type": "application/json"}
+        headers={"Content-Type": "application/json"},
+        timeout=REQUEST_TIMEOUT
     )
-    return response.json()
+    result = _parse_json(response)
+    if wait and result.get('success') and result.get('job_id'):
+        return wait_for_job(result['job_id'])
+    return result
 
 
-def fetch_trending_articles(limit: int = 10) -> Dict:
+def fetch_top_articles(limit: int = 10, wait: bool = True) -> Dict:
+    # Fetch top articles from HackerNews and store in database
+    return _start_fetch("top", limit, wait)
+
+
+def fetch_trending_articles(limit: int = 10, wait: bool = True) -> Dict:
     # Fetch trending articles from HackerNews and store in database
-    response = requests.post(
-        f"{get_api_base_url()}/articles/fetch/trending",
-        json={"limit": limit},
-        headers={"Content-Type": "application/json"}
-    )
-    return response.json()
+    return _start_fetch("trending", limit, wait)
 
 
-def fetch_new_articles(limit: int = 10) -> Dict:
+def fetch_new_articles(limit: int = 10, wait: bool = True) -> Dict:
     # Fetch new articles from HackerNews and store in database
-    response = requests.post(
-        f"{get_api_base_url()}/articles/fetch/new",
-        json={"limit": limit},
-        headers={"Content-Type": "application/json"}
-    )
-    return response.json()
+    return _start_fetch("new", limit, wait)
+
+
+def fetch_all_articles(limit: int = 10, wait: bool = True) -> Dict:
+    # Fetch top, trending and new articles from HackerNews and store in database
+    return _start_fetch("all", limit, wait)
 
 
 def get_articles(
@@ -53,7 +117,8 @@ def get_articles(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     sort_by: str = 'score',
-    order: str = 'desc'
+    order: str = 'desc',
+    cursor: Optional[str] = None
 ) -> Dict:
     # Get articles from database with filters
     params = {
@@ -77,28 +142,31 @@ def get_articles(
         params['start_date'] = start_date
     if end_date:
         params['end_date'] = end_date
+    if cursor:
+        params['cursor'] = cursor
     
-    response = requests.get(f"{get_api_base_url()}/articles", params=params)
-    return response.json()
+    response = _session.get(f"{get_api_base_url()}/articles", params=params, timeout=REQUEST_TIMEOUT)
+    return _parse_json(response)
 
 
 def get_article_by_id(article_id: int) -> Dict:
     # Get a specific article by database ID
-    response = requests.get(f"{get_api_base_url()}/articles/{article_id}")
-    return response.json()
+    response = _session.get(f"{get_api_base_url()}/articles/{article_id}", timeout=REQUEST_TIMEOUT)
+    return _parse_json(response)
 
 
 def get_trending_articles(limit: int = 10) -> Dict:
     # Get trending articles from database
-    response = requests.get(
+    response = _session.get(
         f"{get_api_base_url()}/articles/trending",
-        params={'limit': limit}
+        params={'limit': limit},
+        timeout=REQUEST_TIMEOUT
     )
-    return response.json()
+    return _parse_json(response)
 
 
 def get_stats() -> Dict:
     # Get statistics about articles
-    response = requests.get(f"{get_api_base_url()}/articles/stats")
-    return response.json()
+    response = _session.get(f"{get_api_base_url()}/articles/stats", timeout=REQUEST_TIMEOUT)
+    return _parse_json(response)
 
@@ -0,0 +1,289 @@
+# Cache - in-process TTL and query caches plus persistent embedding and scraped-page caches for expensive results
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from app.config import Config
+
+
+class TTLCache:
+    # Thread-safe key/value cache whose entries expire ttl seconds after being set
+
+    def __init__(self, ttl: float, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        # Return the cached value, or None if missing or expired
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        # Store value under key, evicting the oldest entry when full
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class _SQLiteStore:
+    # Base for the persistent caches: one SQLite connection per process, opened on first use.
+    # Relative paths resolve against the project root, so the file doesn't depend on the working directory;
+    # ":memory:" is kept as is and gives a private in-memory store
+
+    # Statements run once on each new connection to create the schema
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = path if path == ':memory:' else os.path.join(Config.BASE_DIR, path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        _stores.add(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connection for this process; call with self._lock held
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            with conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def _reset_after_fork(self) -> None:
+        # SQLite connections must not be used across fork: the child opens its own on next use. The parent's handle
+        # is kept referenced rather than closed, since closing it here could disturb the parent's file locks
+        if self._conn is not None:
+            _inherited_connections.append(self._conn)
+        self._conn = None
+        self._lock = threading.Lock()
+
+
+_stores: 'weakref.WeakSet[_SQLiteStore]' = weakref.WeakSet()
+_inherited_connections: List[sqlite3.Connection] = []
+
+
+def _reset_stores_after_fork() -> None:
+    for store in list(_stores):
+        store._reset_after_fork()
+
+
+# Covers gunicorn --preload: services (and their caches) are created before workers fork
+os.register_at_fork(after_in_child=_reset_stores_after_fork)
+
+
+class EmbeddingCache(_SQLiteStore):
+    # Persistent LRU store of embedding vectors keyed by a hash of (model, text); entries expire ttl seconds after being stored
+
+    # Trim expired and least recently used rows once every this many writes
+    PRUNE_EVERY = 100
+    SCHEMA = (
+        # Earlier layout without store/access times - it only held cached vectors, so it is dropped
+        "DROP TABLE IF EXISTS embeddings",
+        "CREATE TABLE IF NOT EXISTS vectors ("
+        "key BLOB PRIMARY KEY, vector BLOB NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_vectors_accessed_at ON vectors (accessed_at)"
+    )
+
+    def __init__(self, path: str, ttl: float = 30 * 86400, max_entries: int = 50000):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+
+    @staticmethod
+    def _key(model: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{model}\x00{text}".encode(), digest_size=32).digest()
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[int, np.ndarray]:
+        # Look up vectors for texts. Returns: {index in texts: float32 vector} for live cache hits only
+        keys = [self._key(model, text) for text in texts]
+        found: Dict[bytes, bytes] = {}
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                hits = [
+                    (key, vector) for key, vector, stored_at in conn.execute(
+                        f"SELECT key, vector, stored_at FROM vectors WHERE key IN ({placeholders})", batch
+                    ) if stored_at + self.ttl > now
+                ]
+                if hits:
+                    # Expired rows are left for the next prune; live ones count as recently used
+                    conn.execute(
+                        f"UPDATE vectors SET accessed_at = ? WHERE key IN ({','.join('?' * len(hits))})",
+                        [now, *(key for key, _ in hits)]
+                    )
+                    found.update(hits)
+        return {
+            idx: np.frombuffer(found[key], dtype=np.float32)
+            for idx, key in enumerate(keys) if key in found
+        }
+
+    def set_many(self, model: str, items: List[Tuple[str, np.ndarray]]) -> None:
+        # Store (text, vector) pairs as float32 bytes; periodically evicts expired and least recently used rows
+        now = time.time()
+        rows = [
+            (self._key(model, text), np.asarray(vector, dtype=np.float32).tobytes(), now, now)
+            for text, vector in items
+        ]
+        with self._lock, self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector, stored_at, accessed_at) VALUES (?, ?, ?, ?)", rows
+            )
+            # Counted per row, so large ingestion batches prune as often as many small writes would
+            previous, self._writes = self._writes, self._writes + len(rows)
+            if previous // self.PRUNE_EVERY != self._writes // self.PRUNE_EVERY:
+                conn.execute("DELETE FROM vectors WHERE stored_at <= ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM vectors WHERE key IN "
+                    "(SELECT key FROM vectors ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+
+class ScrapeCache(_SQLiteStore):
+    # Persistent LRU store of scraped page text keyed by a hash of (namespace, url); entries expire ttl seconds after being stored
+
+    # Trim expired and least recently used rows once every this many writes
+    PRUNE_EVERY = 100
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS pages ("
+        "key BLOB PRIMARY KEY, content BLOB NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_pages_accessed_at ON pages (accessed_at)"
+    )
+
+    def __init__(self, path: str, ttl: float = 86400, max_entries: int = 50000):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+
+    @staticmethod
+    def _key(namespace: str, url: str) -> bytes:
+        return hashlib.blake2b(f"{namespace}\x00{url}".encode(), digest_size=32).digest()
+
+    def get(self, namespace: str, url: str) -> Optional[str]:
+        # Return the cached text for url, or None if missing or expired
+        key = self._key(namespace, url)
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            row = conn.execute("SELECT content, stored_at FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, stored_at = row
+            if stored_at + self.ttl <= now:
+                conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key))
+        return zlib.decompress(content).decode()
+
+    def set(self, namespace: str, url: str, content: str) -> None:
+        # Store text for url, compressed; periodically evicts expired and least recently used rows
+        now = time.time()
+        row = (self._key(namespace, url), zlib.compress(content.encode(), 6), now, now)
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (key, content, stored_at, accessed_at) VALUES (?, ?, ?, ?)", row
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM pages WHERE stored_at <= ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM pages WHERE key IN "
+                    "(SELECT key FROM pages ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+
+class SemanticCache:
+    # LRU cache of query results looked up by exact query text or by a near-duplicate query embedding
+
+    def __init__(self, maxsize: int = 512, threshold: float = 0.95, ttl: float = 300):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> slot in the embedding matrix; ordered oldest to most recently used
+        self._slots: 'OrderedDict[Hashable, int]' = OrderedDict()
+        self._entries: Dict[int, Tuple[Hashable, float, Any]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._valid = np.zeros(maxsize, dtype=bool)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        # Exact lookup by key. Returns: Cached value or None
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None or not self._is_live(slot):
+                return None
+            self._slots.move_to_end(key)
+            return self._entries[slot][2]
+
+    def get_similar(self, vector: np.ndarray) -> Optional[Any]:
+        # Lookup by unit-length embedding: the value of the closest cached query if its cosine similarity >= threshold
+        with self._lock:
+            if self._matrix is None or not self._valid.any():
+                return None
+            # One matrix-vector product scores every cached query
+            sims = self._matrix @ np.asarray(vector, dtype=np.float32)
+            sims[~self._valid] = -np.inf
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold or not self._is_live(slot):
+                return None
+            key = self._entries[slot][0]
+            self._slots.move_to_end(key)
+            return self._entries[slot][2]
+
+    def set(self, key: Hashable, vector: np.ndarray, value: Any) -> None:
+        # Store value under key with the query's unit-length embedding, evicting the least recently used entry when full
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+            slot = self._slots.pop(key, None)
+            if slot is None:
+                if len(self._slots) >= self.maxsize:
+                    _, slot = self._slots.popitem(last=False)
+                else:
+                    slot = int(np.flatnonzero(~self._valid)[0])
+            self._slots[key] = slot
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = (key, time.monotonic() + self.ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots.clear()
+            self._entries.clear()
+            self._valid[:] = False
+
+    def _is_live(self, slot: int) -> bool:
+        # Drop the entry in slot if it has expired (caller holds the lock)
+        key, expires_at, _ = self._entries[slot]
+        if expires_at > time.monotonic():
+            return True
+        del self._slots[key]
+        del self._entries[slot]
+        self._valid[slot] = False
+        return False
@@ -0,0 +1,96 @@
+# Concurrency - helpers for overlapping blocking I/O and pacing calls to rate-limited providers
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+_rate_limiters: Dict[str, 'RateLimiter'] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def parallel_map(fn: Callable[[T], R], items: Iterable[T], max_workers: int) -> List[R]:
+    # Apply fn to every item on up to max_workers threads. Returns: Results in items order (the first exception is re-raised)
+    items = list(items)
+    # Nothing to overlap: skip spinning up threads
+    if len(items) <= 1 or max_workers <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(fn, items))
+
+
+class RateLimiter:
+    # Thread-safe token bucket: acquire() blocks until a call fits under rate_per_minute, allowing bursts of up to burst calls
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        # Take one token, sleeping until one is available. A rate of 0 or less means unlimited
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_rate_limiter(provider: str, rate_per_minute: float, burst: int = 1) -> RateLimiter:
+    # Shared limiter per provider, so every service instance calling the same API draws from one budget
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            limiter = _rate_limiters[provider] = RateLimiter(rate_per_minute, burst)
+        return limiter
+
+
+class _Call:
+    # One in-flight SingleFlight call: waiters block on done, then read result or error
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    # Collapse concurrent calls that share a key into one: callers arriving while a call is running
+    # wait for it and get its result (or exception) instead of repeating the work. Nothing is kept after it returns
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], R]) -> R:
+        # Run fn() unless a call for key is already in flight, in which case wait for that one
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
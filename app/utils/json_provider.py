@@ -0,0 +1,27 @@
+# JSON Provider - orjson-backed serialization for Flask responses
+import decimal
+from typing import Any, Union
+import orjson
+from flask.json.provider import JSONProvider
+
+
+def _default(obj: Any) -> Any:
+    # Serialize types orjson doesn't handle natively (e.g. Decimal from AVG/SUM aggregates)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    # Flask JSON provider using orjson. datetimes are serialized natively as ISO 8601
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=_default).decode()
+    
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any):
+        # Skip the bytes -> str -> bytes round-trip of the base implementation
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=_default), mimetype="application/json")
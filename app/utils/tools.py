@@ -1,6 +1,8 @@
 # LangChain Tools for HackerNews Article Operations
-from langchain.tools import tool
-from typing import Optional
+import asyncio
+import functools
+from langchain.tools import StructuredTool
+from typing import Dict, List, Optional, Union
 from app.utils.api_client import (
     fetch_top_articles,
     fetch_trending_articles,
@@ -10,48 +12,104 @@ from app.utils.api_client import (
     get_trending_articles,
     get_stats
 )
-
-
-@tool
-def fetch_top_hn_articles(limit: int = 10) -> str:
-    """Fetch top articles from HackerNews API and store them in the database."""
-    try:
-        result = fetch_top_articles(limit)
-        if result.get('success'):
-            return f"Successfully fetched top articles. Saved: {result['saved']}, Updated: {result['updated']}"
-        else:
-            return f"Error fetching articles: {result.get('error', 'Unknown error')}"
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-
-@tool
-def fetch_trending_hn_articles(limit: int = 10) -> str:
-    """Fetch trending articles from HackerNews API and store them in the database."""
-    try:
-        result = fetch_trending_articles(limit)
-        if result.get('success'):
-            return f"Successfully fetched trending articles. Saved: {result['saved']}, Updated: {result['updated']}"
-        else:
-            return f"Error fetching articles: {result.get('error', 'Unknown error')}"
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-
-@tool
-def fetch_new_hn_articles(limit: int = 10) -> str:
-    """Fetch new articles from HackerNews API and store them in the database."""
-    try:
-        result = fetch_new_articles(limit)
+from app.utils.cache import TTLCache
+from app.utils.concurrency import SingleFlight
+
+# Seconds the stats/trending tool output is reused - the agent is told to call get_article_statistics
+# first on date questions, so it often repeats within a conversation
+TOOL_CACHE_TTL = 30
+_tool_cache = TTLCache(ttl=TOOL_CACHE_TTL, maxsize=16)
+# Formatted article details by id; expire so score/comment counts refreshed by another process show up
+ARTICLE_DETAILS_TTL = 300
+_details_cache = TTLCache(ttl=ARTICLE_DETAILS_TTL, maxsize=1024)
+# Concurrent identical fetch tool calls share one HN fetch + DB upsert instead of racing each other
+_fetch_flight = SingleFlight()
+# Upper bound on the limit the agent may pass to a tool; larger values would pull whole tables into one observation
+MAX_TOOL_LIMIT = 200
+
+
+def _clamp_limit(limit: int) -> int:
+    # Keep a model-supplied limit within 1..MAX_TOOL_LIMIT
+    return min(max(int(limit), 1), MAX_TOOL_LIMIT)
+
+
+def _tool_errors(prefix: str):
+    # Decorator for tool bodies: turn an unexpected exception into a "<prefix>: <error>" message the agent can read,
+    # so one failing backend call doesn't abort the whole agent run
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                return f"{prefix}: {str(e)}"
+        return wrapper
+    return decorator
+
+
+def _threaded_tool(func, **kwargs):
+    # StructuredTool whose async path (agent ainvoke) runs the blocking body on a worker thread, so tool calls
+    # the agent issues together overlap their HTTP/DB waits instead of stacking up. The sync path is unchanged
+    async def coroutine(*args, **kw):
+        return await asyncio.to_thread(func, *args, **kw)
+    return StructuredTool.from_function(func=func, coroutine=coroutine, **kwargs)
+
+
+def _make_fetch_tool(fetch_func, label: str):
+    # Build the fetch-and-store tool for one HackerNews list; only the backend call and wording differ
+    @_tool_errors("Error")
+    def fetch_hn_articles(limit: int = 10) -> str:
+        limit = _clamp_limit(limit)
+        result = _fetch_flight.do((label, limit), lambda: fetch_func(limit))
         if result.get('success'):
-            return f"Successfully fetched new articles. Saved: {result['saved']}, Updated: {result['updated']}"
+            # New articles change the stats and trending list; refreshed scores change article details
+            _tool_cache.clear()
+            _details_cache.clear()
+            return f"Successfully fetched {label} articles. Saved: {result['saved']}, Updated: {result['updated']}"
         else:
             return f"Error fetching articles: {result.get('error', 'Unknown error')}"
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-
-@tool
+    
+    return _threaded_tool(
+        fetch_hn_articles,
+        name=f"fetch_{label}_hn_articles",
+        description=f"Fetch {label} articles from HackerNews API and store them in the database."
+    )
+
+
+fetch_top_hn_articles = _make_fetch_tool(fetch_top_articles, 'top')
+fetch_trending_hn_articles = _make_fetch_tool(fetch_trending_articles, 'trending')
+fetch_new_hn_articles = _make_fetch_tool(fetch_new_articles, 'new')
+
+
+def _article_row(article: Dict, include_tags: bool) -> Dict:
+    # One listing entry; optional fields are left out when empty to keep the payload small
+    get = article.get
+    row = {
+        'id': get('id'),
+        'title': get('title'),
+        'author': get('author'),
+        'score': get('score', 0),
+        'comments': get('comment_count', 0)
+    }
+    url = get('url')
+    if url:
+        row['url'] = url
+    if include_tags:
+        tags = get('tags')
+        if tags:
+            row['tags'] = tags
+    return row
+
+
+def _article_listing(articles: List[Dict], include_tags: bool) -> Dict:
+    # Compact JSON-serializable listing for the agent: the tool-calling agent passes it to the model as JSON,
+    # which is shorter than a prose rendering and needs no string building here
+    rows = [_article_row(article, include_tags) for article in articles]
+    return {'count': len(rows), 'articles': rows}
+
+
+@_threaded_tool
+@_tool_errors("Error searching articles")
 def search_articles(
     keyword: Optional[str] = None,
     author: Optional[str] = None,
@@ -63,123 +121,117 @@ def search_articles(
     sort_by: str = 'score',
     order: str = 'desc',
     limit: int = 10
-) -> str:
+) -> Union[Dict, str]:
     """Search and retrieve articles from the database with various filters including date range. 
     For date searches: Use format YYYY-MM-DD (e.g., '2025-11-09'). To search a specific day, use the same date for both start_date and end_date. 
     IMPORTANT: When users ask for a specific date without a year, use get_article_statistics tool FIRST to check what years are available in the database."""
-    try:
-        result = get_articles(
-            page=1,
-            per_page=limit,
-            keyword=keyword,
-            author=author,
-            min_score=min_score,
-            max_score=max_score,
-            tag=tag,
-            start_date=start_date,
-            end_date=end_date,
-            sort_by=sort_by,
-            order=order
-        )
-        
-        if result.get('success') and result.get('data'):
-            articles = result['data']
-            summary = f"Found {len(articles)} articles:\n\n"
-            for i, article in enumerate(articles, 1):
-                article_id = article.get('id', 'N/A')
-                summary += f"{i}. {article.get('title', 'N/A')}\n"
-                summary += f"   ID: {article_id}\n"
-                summary += f"   Author: {article.get('author', 'N/A')}\n"
-                summary += f"   Score: {article.get('score', 0)}\n"
-                summary += f"   Comments: {article.get('comment_count', 0)}\n"
-                url = article.get('url', 'N/A')
-                if url and url != 'N/A':
-                    summary += f"   Article URL: {url}\n"
-                if article.get('tags'):
-                    summary += f"   Tags: {article.get('tags')}\n"
-                summary += "\n"
-            return summary
-        else:
-            return "No articles found matching the criteria."
-    except Exception as e:
-        return f"Error searching articles: {str(e)}"
+    limit = _clamp_limit(limit)
+    result = get_articles(
+        page=1,
+        per_page=limit,
+        keyword=keyword,
+        author=author,
+        min_score=min_score,
+        max_score=max_score,
+        tag=tag,
+        start_date=start_date,
+        end_date=end_date,
+        sort_by=sort_by,
+        order=order
+    )
+    
+    if result.get('success') and result.get('data'):
+        return _article_listing(result['data'], include_tags=True)
+    else:
+        return "No articles found matching the criteria."
+
+
+def _article_details(article_id: int) -> str:
+    # Formatted details for one article. Raises LookupError if it doesn't exist
+    result = get_article_by_id(article_id)
+    if not (result.get('success') and result.get('data')):
+        raise LookupError(f"Article with ID {article_id} not found.")
+    get = result['data'].get
+    details = [
+        "Article Details:\n\n"
+        f"Title: {get('title', 'N/A')}\n"
+        f"Author: {get('author', 'N/A')}\n"
+        f"Score: {get('score', 0)}\n"
+        f"Comments: {get('comment_count', 0)}\n"
+        f"URL: {get('url', 'N/A')}\n"
+    ]
+    tags = get('tags')
+    if tags:
+        details.append(f"Tags: {tags}\n")
+    details.append(f"Created: {get('created_at', 'N/A')}\n")
+    return "".join(details)
 
 
-@tool
+@_threaded_tool
+@_tool_errors("Error getting article details")
 def get_article_details(article_id: int) -> str:
     """Get detailed information about a specific article by its database ID."""
+    cached = _details_cache.get(article_id)
+    if cached is not None:
+        return cached
     try:
-        result = get_article_by_id(article_id)
-        if result.get('success') and result.get('data'):
-            article = result['data']
-            details = f"Article Details:\n\n"
-            details += f"Title: {article.get('title', 'N/A')}\n"
-            details += f"Author: {article.get('author', 'N/A')}\n"
-            details += f"Score: {article.get('score', 0)}\n"
-            details += f"Comments: {article.get('comment_count', 0)}\n"
-            details += f"URL: {article.get('url', 'N/A')}\n"
-            if article.get('tags'):
-                details += f"Tags: {article.get('tags')}\n"
-            details += f"Created: {article.get('created_at', 'N/A')}\n"
-            return details
-        else:
-            return f"Article with ID {article_id} not found."
-    except Exception as e:
-        return f"Error getting article details: {str(e)}"
+        details = _article_details(article_id)
+    except LookupError as e:
+        # Not cached, so an article saved later is found on the next call
+        return str(e)
+    _details_cache.set(article_id, details)
+    return details
 
 
-@tool
-def get_trending_articles_from_db(limit: int = 10) -> str:
+@_threaded_tool
+@_tool_errors("Error getting trending articles")
+def get_trending_articles_from_db(limit: int = 10) -> Union[Dict, str]:
     """Get trending articles from the database, sorted by score."""
-    try:
-        result = get_trending_articles(limit)
-        if result.get('success') and result.get('data'):
-            articles = result['data']
-            summary = f"Top {len(articles)} Trending Articles:\n\n"
-            for i, article in enumerate(articles, 1):
-                article_id = article.get('id', 'N/A')
-                summary += f"{i}. {article.get('title', 'N/A')}\n"
-                summary += f"   ID: {article_id}\n"
-                summary += f"   Author: {article.get('author', 'N/A')}\n"
-                summary += f"   Score: {article.get('score', 0)}\n"
-                summary += f"   Comments: {article.get('comment_count', 0)}\n"
-                url = article.get('url', 'N/A')
-                if url and url != 'N/A':
-                    summary += f"   Article URL: {url}\n"
-                summary += "\n"
-            return summary
-        else:
-            return "No trending articles found."
-    except Exception as e:
-        return f"Error getting trending articles: {str(e)}"
-
-
-@tool
+    limit = _clamp_limit(limit)
+    cache_key = ('trending', limit)
+    cached = _tool_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = get_trending_articles(limit)
+    if result.get('success') and result.get('data'):
+        output = _article_listing(result['data'], include_tags=False)
+        _tool_cache.set(cache_key, output)
+        return output
+    else:
+        return "No trending articles found."
+
+
+@_threaded_tool
+@_tool_errors("Error getting statistics")
 def get_article_statistics() -> str:
     """Get statistics about articles in the database including date range. Use this FIRST when users ask about specific dates to know what date ranges are available."""
-    try:
-        result = get_stats()
-        if result.get('success') and result.get('stats'):
-            stats = result['stats']
-            summary = "Article Statistics:\n\n"
-            summary += f"Total Articles: {stats.get('total_articles', 0)}\n"
-            summary += f"Average Score: {stats.get('average_score', 0):.2f}\n"
-            summary += f"Max Score: {stats.get('max_score', 0)}\n"
-            summary += f"Total Comments: {stats.get('total_comments', 0)}\n"
-            
-            # Add date range information
-            earliest = stats.get('earliest_article_date')
-            latest = stats.get('latest_article_date')
-            if earliest and latest:
-                summary += f"\n📅 Date Range:\n"
-                summary += f"  Earliest Article: {earliest}\n"
-                summary += f"  Latest Article: {latest}\n"
-            
-            return summary
-        else:
-            return "Unable to retrieve statistics."
-    except Exception as e:
-        return f"Error getting statistics: {str(e)}"
+    cached = _tool_cache.get(('stats',))
+    if cached is not None:
+        return cached
+    result = get_stats()
+    if result.get('success') and result.get('stats'):
+        stats = result['stats']
+        summary = [
+            "Article Statistics:\n\n",
+            f"Total Articles: {stats.get('total_articles', 0)}\n",
+            f"Average Score: {stats.get('average_score', 0):.2f}\n",
+            f"Max Score: {stats.get('max_score', 0)}\n",
+            f"Total Comments: {stats.get('total_comments', 0)}\n"
+        ]
+        
+        # Add date range information
+        earliest = stats.get('earliest_article_date')
+        latest = stats.get('latest_article_date')
+        if earliest and latest:
+            summary.append("\n📅 Date Range:\n")
+            summary.append(f"  Earliest Article: {earliest}\n")
+            summary.append(f"  Latest Article: {latest}\n")
+        
+        output = "".join(summary)
+        _tool_cache.set(('stats',), output)
+        return output
+    else:
+        return "Unable to retrieve statistics."
 
 
 def get_all_tools():
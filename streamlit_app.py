@@ -93,21 +93,18 @@ def initialize_agent():
     return agent_executor
 
 
+# Simpler pattern that catches most URLs; one greedy character class, so matching is a
+# single forward pass with no backtracking (slashes are already part of the class)
+URL_PATTERN = re.compile(r'https?://[^\s<>"\'\)\]]+')
+
+
 def extract_urls(text):
     # Extract URLs from text - simplified and more reliable pattern
-    # Simpler pattern that catches most URLs including those with slashes
-    url_pattern = r'https?://[^\s<>"\'\)\]]+(?:/[^\s<>"\'\)\]]*)?'
-    urls = re.findall(url_pattern, text)
-    
-    # Clean up URLs - remove trailing punctuation
-    cleaned_urls = []
-    for url in urls:
-        # Remove trailing punctuation
-        url = url.rstrip('.,;:!?')
-        if url:
-            cleaned_urls.append(url)
+    if not text or 'http' not in text:
+        return []
     
-    return list(set(cleaned_urls))  # Remove duplicates
+    # Remove trailing punctuation, then duplicates (keeping first-seen order)
+    return list(dict.fromkeys(url.rstrip('.,;:!?') for url in URL_PATTERN.findall(text)))
 
 
 def get_agent_response(agent_executor, conversation_history, user_prompt):
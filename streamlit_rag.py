@@ -215,15 +215,15 @@ with st.sidebar:
         st.success(f"Showing {len(current_headers)}/4 relevant articles")
         for idx, header in enumerate(current_headers, 1):
             # Use article title as the expander name (truncate if too long)
-            display_title = UIHelper.truncate_text(header['article_title'], max_length=50)
+            display_title = UIHelper.truncate_text(header.article_title, max_length=50)
             
             # Show expander with article title
-            with st.expander(f"📄 {display_title} ({header['similarity_score']:.3f})", expanded=False):
-                st.markdown(f"**Full Title:** {header['article_title']}")
-                st.markdown(f"**Header:** {header['header_text'][:100]}...")
+            with st.expander(f"📄 {display_title} ({header.similarity_score:.3f})", expanded=False):
+                st.markdown(f"**Full Title:** {header.article_title}")
+                st.markdown(f"**Header:** {header.header_text[:100]}...")
                 
                 # Embed the URL
-                url = header['article_url']
+                url = header.article_url
                 if url:
                     st.markdown(f"[🔗 Open Article]({url})")
                     try:
@@ -399,7 +399,7 @@ if prompt:
                 # Get response using RAG Service
                 # Note: messages already includes the current user prompt
                 conversation_history = messages[:-1]  # All messages except the last one (current prompt)
-                response_text, retrieved_headers = rag_service.process_query(prompt, conversation_history)
+                response_stream, retrieved_headers = rag_service.stream_query(prompt, conversation_history)
                 
                 # Update session state with retrieved headers for sidebar display
                 try:
@@ -416,16 +416,16 @@ if prompt:
                     if hasattr(st, '_local_state'):
                         st._local_state['suggested_questions'] = suggested
                 
-                # Display the LLM response
-                st.markdown(response_text)
+                # Display the LLM response as it streams in
+                response_text = st.write_stream(response_stream)
                 
                 # Show retrieved context summary
                 if retrieved_headers:
                     with st.expander("🔍 View Retrieved Context", expanded=False):
                         st.success(f"Found {len(retrieved_headers)} relevant headers")
                         for idx, header in enumerate(retrieved_headers, 1):
-                            st.write(f"**{idx}. {header['header_text'][:80]}...**")
-                            st.caption(f"From: {header['article_title']} (Score: {header['similarity_score']:.3f})")
+                            st.write(f"**{idx}. {header.header_text[:80]}...**")
+                            st.caption(f"From: {header.article_title} (Score: {header.similarity_score:.3f})")
                 else:
                     st.info("No relevant context found in knowledge base")
                 